@@ -0,0 +1,82 @@
+"""
+Throughput benchmark: batched Whisper decoding vs one model.transcribe per file
+
+Usage:
+    python benchmarks/bench_batch_transcription.py --source talk.mp4 --model tiny
+Clips of each length are cut from the source (a generated tone is used when no
+source is given, which measures speed but not realistic decoding). Batched
+windows are not conditioned on the previous window's text, so compare the
+transcripts too before switching long files to batching.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(current_dir, "..", "src"))
+
+from batch_transcriber import BatchTranscriber
+from video_processor import ModelPool, VideoProcessor
+
+def make_clips(source, length, count, work_dir):
+    """Cut count 16 kHz mono clips of length seconds"""
+    clips = []
+    for idx in range(count):
+        clip_path = os.path.join(work_dir, f"clip_{length}s_{idx}.wav")
+        if source:
+            cmd = ["ffmpeg", "-y", "-ss", str(idx * length), "-t", str(length), "-i", source,
+                   "-ac", "1", "-ar", "16000", "-acodec", "pcm_s16le", clip_path]
+        else:
+            cmd = ["ffmpeg", "-y", "-f", "lavfi", "-i",
+                   f"sine=frequency={220 + 40 * idx}:duration={length}",
+                   "-ac", "1", "-ar", "16000", "-acodec", "pcm_s16le", clip_path]
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        clips.append(clip_path)
+    return clips
+
+def time_sequential(clips, model_size):
+    start = time.perf_counter()
+    for clip in clips:
+        VideoProcessor.transcribe_with_whisper(clip, model_size)
+    return time.perf_counter() - start
+
+def time_batched(clips, model_size, batch_size):
+    transcriber = BatchTranscriber(model_size, batch_size=batch_size, max_wait=0.05)
+    start = time.perf_counter()
+    transcriber.transcribe_files(clips)
+    elapsed = time.perf_counter() - start
+    transcriber.close()
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--source", help="Audio or video file to cut clips from")
+    parser.add_argument("--model", default="tiny")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--lengths", default="5,15,30,60", help="Clip lengths in seconds")
+    parser.add_argument("--count", type=int, default=8, help="Clips per length")
+    args = parser.parse_args()
+
+    # Load the model outside the timed region
+    with ModelPool.acquire(args.model):
+        pass
+
+    print(f"model={args.model} batch_size={args.batch_size} clips/length={args.count}")
+    print("Batched windows are decoded without the previous window's text as prompt")
+    print(f"{'length':>8} {'sequential':>12} {'batched':>12} {'x realtime':>22} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as work_dir:
+        for length in [int(value) for value in args.lengths.split(",")]:
+            clips = make_clips(args.source, length, args.count, work_dir)
+            audio_seconds = length * args.count
+            sequential = time_sequential(clips, args.model)
+            batched = time_batched(clips, args.model, args.batch_size)
+            print(f"{length:>7}s {sequential:>11.2f}s {batched:>11.2f}s "
+                  f"{audio_seconds / sequential:>10.1f} / {audio_seconds / batched:<10.1f} "
+                  f"{sequential / batched:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Scaling benchmark: word-timed cue building and translation mapping
+
+Usage:
+    python benchmarks/bench_cue_splitting.py --words 10000,50000,100000
+Synthetic transcripts with word timestamps, pauses and punctuation are split
+into cues and a per-segment translation is mapped onto them. Time per word
+should stay flat as the transcript grows. A transcript with a pause after every
+segment is checked first: each segment's translation must land in its own cues.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(current_dir, "..", "src"))
+
+from subtitle_creator import SubtitleCreator
+
+VOCABULARY = ("the", "a", "video", "subtitle", "translation", "speech", "model", "is",
+              "quickly", "carefully", "recording", "we", "they", "audio", "about", "with")
+
+def make_transcript(word_count, words_per_segment=12, seed=0, segment_gap=0.3):
+    """Segments with Whisper-style word timestamps and a mock translation each"""
+    rng = random.Random(seed)
+    segments = []
+    translations = []
+    clock = 0.0
+    for first in range(0, word_count, words_per_segment):
+        words = []
+        for idx in range(min(words_per_segment, word_count - first)):
+            text = rng.choice(VOCABULARY)
+            roll = rng.random()
+            if roll < 0.08:
+                text += "."
+            elif roll < 0.15:
+                text += ","
+            duration = 0.15 + rng.random() * 0.35
+            words.append({"word": " " + text, "start": clock, "end": clock + duration})
+            # Mostly tight speech with an occasional pause
+            clock += duration + (0.8 if rng.random() < 0.05 else 0.05)
+        text = "".join(word["word"] for word in words).strip()
+        segments.append({"start": words[0]["start"], "end": words[-1]["end"],
+                         "text": text, "words": words})
+        # Translations are rarely the same length as the source
+        translations.append(" ".join(word.upper() for word in text.split()
+                                     for _ in range(rng.choice((1, 1, 2)))))
+        clock += segment_gap
+    return segments, translations
+
+def check_segment_boundaries(word_count=5000):
+    """With a pause at every segment boundary no cue spans two segments, so the
+    cues of a segment must carry exactly that segment's translation"""
+    segments, translations = make_transcript(word_count, segment_gap=SubtitleCreator.CUE_PAUSE + 0.4)
+    cues = SubtitleCreator._build_word_cues(segments)
+    texts = SubtitleCreator._map_translation(cues, translations)
+    per_segment = [[] for _ in segments]
+    for cue, text in zip(cues, texts):
+        per_segment[cue['segment']].append(text)
+    for idx, (parts, translation) in enumerate(zip(per_segment, translations)):
+        joined = " ".join(part for part in parts if part)
+        assert joined == translation, f"segment {idx}: {joined!r} != {translation!r}"
+    print(f"Segment boundaries: {len(cues)} cues over {len(segments)} segments OK")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--words", default="10000,50000,100000",
+                        help="Transcript sizes in words")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    check_segment_boundaries()
+    print(f"{'words':>8} {'cues':>7} {'build':>9} {'map':>9} {'write':>9} {'us/word':>8}")
+    with tempfile.TemporaryDirectory() as work_dir:
+        output_path = os.path.join(work_dir, "cues.srt")
+        for word_count in [int(value) for value in args.words.split(",")]:
+            segments, translations = make_transcript(word_count)
+            build = mapping = write = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                cues = SubtitleCreator._build_word_cues(segments)
+                build = min(build, time.perf_counter() - start)
+
+                start = time.perf_counter()
+                texts = SubtitleCreator._map_translation(cues, translations)
+                mapping = min(mapping, time.perf_counter() - start)
+
+                start = time.perf_counter()
+                SubtitleCreator.create_word_timed_srt(segments, translations, output_path)
+                write = min(write, time.perf_counter() - start)
+
+            assert len(texts) == len(cues)
+            print(f"{word_count:>8} {len(cues):>7} {build * 1000:>7.1f}ms "
+                  f"{mapping * 1000:>7.1f}ms {write * 1000:>7.1f}ms "
+                  f"{write / word_count * 1e6:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Accuracy benchmark: duplicate detection offsets on trimmed copies
+
+Usage:
+    python benchmarks/bench_fingerprint.py --minutes 30 --trims 0,45,600,1200
+Synthetic audio is fingerprinted and indexed, then copies trimmed at each start
+time are looked up. The offset found must match the trim within one frame, so
+reused subtitles stay in sync however far into the original the copy starts.
+A noisy copy must still be found, and a different file that only shares the
+original's intro must not be.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(current_dir, "..", "src"))
+
+from fingerprint import AudioFingerprinter, FingerprintIndex
+
+def make_audio(seconds, seed=0):
+    """Noise with a new random chord every 100 ms, distinct peaks all along"""
+    rng = np.random.default_rng(seed)
+    rate = AudioFingerprinter.SAMPLE_RATE
+    step = rate // 10
+    t = np.arange(step) / rate
+    pieces = []
+    for _ in range(int(seconds * 10)):
+        freqs = rng.uniform(150, 7000, size=3)
+        piece = sum(np.sin(2 * np.pi * f * t) for f in freqs) / 3
+        pieces.append(piece + rng.normal(0, 0.05, step))
+    return (np.concatenate(pieces) * 0.5 * 32767).astype(np.int16)
+
+def write_wav(path, samples):
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(AudioFingerprinter.SAMPLE_RATE)
+        wav.writeframes(samples.tobytes())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--minutes", type=float, default=30, help="Length of the original")
+    parser.add_argument("--trims", default="0,45,600,1200",
+                        help="Start times of the trimmed copies in seconds")
+    parser.add_argument("--copy-seconds", type=float, default=120,
+                        help="Length of each trimmed copy")
+    parser.add_argument("--intro-seconds", type=float, default=20,
+                        help="Intro shared by the original and an unrelated file")
+    args = parser.parse_args()
+
+    rate = AudioFingerprinter.SAMPLE_RATE
+    samples = make_audio(args.minutes * 60)
+    with tempfile.TemporaryDirectory() as work_dir:
+        original = os.path.join(work_dir, "original.wav")
+        write_wav(original, samples)
+        start = time.perf_counter()
+        hashes, duration = AudioFingerprinter.fingerprint_file(original)
+        elapsed = time.perf_counter() - start
+        print(f"Original: {duration:.0f}s, {len(hashes)} hashes in {elapsed:.2f}s")
+
+        index = FingerprintIndex(os.path.join(work_dir, "fingerprints.db"))
+        index.add(original, hashes, duration,
+                  {"text": "", "segments": [{"start": 0.0, "end": duration, "text": ""}]})
+
+        print(f"{'trim':>8} {'offset':>9} {'error':>8} {'lookup':>8}")
+        failures = 0
+        for trim in [float(value) for value in args.trims.split(",")]:
+            copy = os.path.join(work_dir, "copy.wav")
+            first = int(trim * rate)
+            write_wav(copy, samples[first:first + int(args.copy_seconds * rate)])
+            copy_hashes, copy_duration = AudioFingerprinter.fingerprint_file(copy)
+            start = time.perf_counter()
+            result = index.find(copy_hashes, copy_duration)
+            lookup = time.perf_counter() - start
+            if result is None:
+                print(f"{trim:>8.1f} {'-':>9} {'no match':>8} {lookup * 1000:>6.0f}ms")
+                failures += 1
+                continue
+            error = result["offset"] - trim
+            print(f"{trim:>8.1f} {result['offset']:>9.3f} {error:>+8.3f} {lookup * 1000:>6.0f}ms")
+            if abs(error) > AudioFingerprinter.frame_seconds():
+                failures += 1
+
+        copy = os.path.join(work_dir, "copy.wav")
+        clip = samples[:int(args.copy_seconds * rate)]
+        noise = np.random.default_rng(1).normal(0, 0.1 * np.abs(clip).mean(), len(clip))
+        write_wav(copy, np.clip(clip + noise, -32768, 32767).astype(np.int16))
+        noisy = index.find(*AudioFingerprinter.fingerprint_file(copy))
+        print(f"Noisy copy: {'found' if noisy else 'not found'}")
+        failures += noisy is None
+
+        intro = int(args.intro_seconds * rate)
+        other = make_audio(args.copy_seconds - args.intro_seconds, seed=2)
+        write_wav(copy, np.concatenate((samples[:intro], other)))
+        shared = index.find(*AudioFingerprinter.fingerprint_file(copy))
+        print(f"Different file with a {args.intro_seconds:.0f}s shared intro: "
+              f"{'wrongly matched' if shared else 'not matched'}")
+        failures += shared is not None
+    if failures:
+        sys.exit(f"{failures} duplicate detection check(s) failed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Accuracy/speed benchmark: int8-quantized Whisper vs FP32 on CPU
+
+Usage:
+    python benchmarks/bench_quantization.py --clip talk.wav --reference talk.txt --models tiny,base,small
+Each model and mode runs in its own process so peak memory is measured cleanly.
+The word error rate is computed against the reference transcript, and the
+int8 output is also compared with the FP32 output of the same model size.
+"""
+
+import argparse
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(current_dir, "..", "src"))
+
+def normalize_words(text):
+    """Lowercase words without punctuation"""
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+def word_error_rate(reference, hypothesis):
+    """Word-level edit distance divided by the reference length"""
+    ref = normalize_words(reference)
+    hyp = normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1,
+                             previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return previous[-1] / len(ref)
+
+def model_size_mb(model):
+    """Size of the weights, including packed int8 parameters"""
+    import torch
+    total = 0
+    for value in model.state_dict().values():
+        if isinstance(value, torch.Tensor):
+            total += value.numel() * value.element_size()
+        elif isinstance(value, tuple):  # Packed (weight, bias) of quantized layers
+            total += sum(t.numel() * t.element_size() for t in value
+                         if isinstance(t, torch.Tensor))
+    return total / (1024 * 1024)
+
+def run_single(clip, model_size, quantized, language):
+    """Load and transcribe in this process, print one JSON line"""
+    import torch
+    import whisper
+    from video_processor import ModelPool
+
+    torch.set_num_threads(os.cpu_count() or 1)
+    start = time.perf_counter()
+    model = ModelPool.load(model_size, quantized)
+    load_time = time.perf_counter() - start
+
+    audio = whisper.load_audio(clip)
+    start = time.perf_counter()
+    result = model.transcribe(audio, fp16=False, language=language or None,
+                              condition_on_previous_text=False)
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        "text": result["text"],
+        "language": result.get("language"),
+        "audio_seconds": len(audio) / whisper.audio.SAMPLE_RATE,
+        "elapsed": elapsed,
+        "load_time": load_time,
+        "weights_mb": model_size_mb(model),
+        # ru_maxrss is in KB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+def measure(clip, model_size, quantized, language):
+    cmd = [sys.executable, os.path.abspath(__file__), "--single", "--clip", clip,
+           "--models", model_size, "--language", language or ""]
+    if quantized:
+        cmd.append("--quantized")
+    output = subprocess.run(cmd, stdout=subprocess.PIPE, check=True).stdout.decode()
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clip", required=True, help="Speech recording to transcribe")
+    parser.add_argument("--reference", help="Text file with the correct transcript")
+    parser.add_argument("--models", default="tiny,base,small")
+    parser.add_argument("--language", default="", help="Spoken language, detected if empty")
+    parser.add_argument("--quantized", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        run_single(args.clip, args.models, args.quantized, args.language)
+        return
+
+    reference = None
+    if args.reference:
+        with open(args.reference, "r", encoding="utf-8") as f:
+            reference = f.read()
+
+    print(f"clip={args.clip} threads={os.cpu_count()}")
+    print(f"{'model':>8} {'mode':>5} {'RTF':>6} {'load':>7} {'weights':>9} {'peak RSS':>9} "
+          f"{'WER':>6} {'vs FP32':>8}")
+    for model_size in args.models.split(","):
+        fp32 = measure(args.clip, model_size, False, args.language)
+        # Fix the language so both modes decode the same task
+        language = args.language or fp32["language"]
+        int8 = measure(args.clip, model_size, True, language)
+        for mode, run in (("fp32", fp32), ("int8", int8)):
+            rtf = run["elapsed"] / run["audio_seconds"]
+            wer = f"{word_error_rate(reference, run['text']):.3f}" if reference else "-"
+            drift = f"{word_error_rate(fp32['text'], run['text']):.3f}" if mode == "int8" else "-"
+            print(f"{model_size:>8} {mode:>5} {rtf:>6.3f} {run['load_time']:>6.1f}s "
+                  f"{run['weights_mb']:>7.0f}MB {run['peak_rss_mb']:>7.0f}MB {wer:>6} {drift:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Scaling benchmark: translation memory lookups on a large database
+
+Usage:
+    python benchmarks/bench_translation_memory.py --entries 100000,1000000,3000000
+A memory is filled with synthetic segments, a share of them variations of a
+few templates so some LSH buckets get crowded, then exact, near-duplicate and
+unknown segments are looked up. Lookup time should stay flat as the memory
+grows. Near-duplicates whose estimated similarity reaches the threshold must
+find their own entry or one at least as similar, and unknown segments must
+find nothing. Another template variation is worded differently and never
+reused, so a near-duplicate whose own entry sits in crowded buckets only
+may count as a miss.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(current_dir, "..", "src"))
+
+from translation_memory import TranslationMemory
+
+PAIR = "en>fr"
+TEMPLATES = ("thank you so much for watching this video about {}",
+             "please like and subscribe if you enjoyed the part about {}",
+             "in the next episode we will talk about {}")
+TEMPLATE_SHARE = 0.2   # Entries that are template variations
+
+def make_vocabulary(rng, size=5000):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(3, 9)))
+            for _ in range(size)]
+
+def make_segment(rng, vocabulary, template_share=TEMPLATE_SHARE):
+    if rng.random() < template_share:
+        topic = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 3)))
+        return rng.choice(TEMPLATES).format(topic)
+    return " ".join(rng.choice(vocabulary) for _ in range(rng.randint(6, 14)))
+
+def near_duplicate(rng, segment):
+    """Drop one character, the way a re-transcription differs slightly"""
+    idx = rng.randrange(len(segment))
+    return segment[:idx] + segment[idx + 1:]
+
+def similarity(query, target):
+    """MinHash estimate the lookup compares against the threshold, texts are
+    normalized first so a source and its upper-cased translation compare equal"""
+    signatures = [TranslationMemory._signature(TranslationMemory._normalize(text))
+                  for text in (query, target)]
+    return float((signatures[0] == signatures[1]).mean())
+
+def best_match(query, result, target):
+    """The expected entry, or for near-duplicates one at least as similar"""
+    if result == target or result is None or target is None:
+        return result == target
+    return similarity(query, result) >= similarity(query, target)
+
+def fill(memory, rng, vocabulary, count, stored, batch=10000):
+    while count > 0:
+        items = []
+        for _ in range(min(batch, count)):
+            segment = make_segment(rng, vocabulary)
+            # The translation is the upper-cased source, so results can be compared
+            items.append((segment, segment.upper()))
+        memory.add_many(items, PAIR)
+        # Keep a sample of the stored segments to query later
+        stored.extend(rng.sample(items, min(len(items), 50)))
+        count -= len(items)
+
+def timed_lookups(memory, queries):
+    times = []
+    results = []
+    for text in queries:
+        start = time.perf_counter()
+        results.append(memory.lookup(text, PAIR))
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return results, statistics.median(times) * 1000, times[int(len(times) * 0.99)] * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", default="100000,1000000",
+                        help="Memory sizes to measure, filled incrementally")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(rng)
+    stored = []
+    print(f"{'entries':>9} {'fill':>8} {'kind':>6} {'median':>9} {'p99':>9} {'found':>7}")
+    with tempfile.TemporaryDirectory() as work_dir:
+        memory = TranslationMemory(os.path.join(work_dir, "memory.db"))
+        filled = 0
+        try:
+            for size in sorted(int(value) for value in args.entries.split(",")):
+                start = time.perf_counter()
+                fill(memory, rng, vocabulary, size - filled, stored)
+                filled = size
+                fill_time = time.perf_counter() - start
+
+                sample = rng.sample(stored, min(args.queries, len(stored)))
+                near = [(near_duplicate(rng, text), target) for text, target in sample]
+                # Only near-duplicates above the threshold are expected to be found
+                near = [(query, target) for query, target in near
+                        if similarity(query, target) >= memory.threshold]
+                kinds = {
+                    "exact": [(text, target) for text, target in sample],
+                    "near": near,
+                    "miss": [(make_segment(rng, vocabulary, template_share=0), None)
+                             for _ in sample],
+                }
+                for kind, pairs in kinds.items():
+                    results, median, p99 = timed_lookups(memory, [query for query, _ in pairs])
+                    found = sum(best_match(query, result, target) for result, (query, target)
+                                in zip(results, pairs)) / len(pairs)
+                    print(f"{size:>9} {fill_time:>7.0f}s {kind:>6} {median:>7.3f}ms "
+                          f"{p99:>7.3f}ms {found:>7.1%}")
+        finally:
+            memory.close()
+
+if __name__ == "__main__":
+    main()
@@ -5,23 +5,103 @@ A tool to transcribe, translate and add subtitles to videos
 
 import sys
 import os
+import argparse
 
 # Add the src directory to Python path
 current_dir = os.path.dirname(os.path.abspath(__file__))
 src_dir = os.path.join(current_dir, 'src')
 sys.path.insert(0, src_dir)
 
-# Now import from src
-try:
-    from gui import VideoTranslatorApp
-    print("✓ Modules imported successfully")
-except ImportError as e:
-    print(f"✗ Import error: {e}")
-    print("Make sure you're running from the correct directory")
-    sys.exit(1)
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Video Translator")
+    parser.add_argument("--watch", metavar="PATH",
+                        help="Watch a folder (or a JSON watch config) instead of starting the GUI")
+    parser.add_argument("--worker", action="store_true",
+                        help="Run stage tasks from the --queue instead of starting the GUI")
+    parser.add_argument("--submit", nargs="+", metavar="VIDEO",
+                        help="Queue videos for the workers of --queue and exit")
+    parser.add_argument("--queue", default=None,
+                        help="Queue directory shared by workers (default: ~/.video_translator/queue)")
+    parser.add_argument("--stages", default="extract,transcribe,translate,burn",
+                        help="Stages this --worker runs, comma separated")
+    parser.add_argument("--lang", default="ar", help="Target language for --watch and --submit")
+    parser.add_argument("--model", default="small",
+                        help="Whisper model for --watch and --submit, or \"auto\" to pick one per file")
+    parser.add_argument("--time-budget", default=None,
+                        help="Transcription time allowed per file with --model auto "
+                             "(seconds or [HH:]MM:SS, default: the audio length)")
+    parser.add_argument("--workers", type=int, default=2, help="Maximum concurrent jobs")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="Decode audio windows of concurrent jobs in batches of this size")
+    parser.add_argument("--max-cpus", type=int, default=None,
+                        help="Cores the jobs may use together (default: all)")
+    return parser.parse_args()
+
+def run_watcher(args):
+    """Start the watch-folder daemon"""
+    from scheduler import ResourceScheduler
+    from watcher import FolderWatcher
+    
+    options = {"max_workers": args.workers, "batch_size": args.batch_size}
+    if args.max_cpus:
+        options["scheduler"] = ResourceScheduler(max_cpus=args.max_cpus)
+    
+    if os.path.isfile(args.watch):
+        watcher = FolderWatcher.from_config(args.watch, **options)
+    else:
+        folder = {"path": args.watch,
+                  "settings": {"dest_lang": args.lang, "model_size": args.model,
+                               "time_budget": args.time_budget}}
+        watcher = FolderWatcher([folder], **options)
+    
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        print("Watcher stopped, running jobs were cancelled")
+
+def run_queue(args):
+    """Submit videos to the stage queue or run a stage worker"""
+    from scheduler import ResourceScheduler
+    from task_queue import TaskQueue, DEFAULT_QUEUE_DIR
+    from worker import StageWorker
+    
+    queue = TaskQueue(args.queue or DEFAULT_QUEUE_DIR)
+    if args.submit:
+        settings = {"dest_lang": args.lang, "model_size": args.model,
+                    "time_budget": args.time_budget}
+        for video_path in args.submit:
+            job = StageWorker.submit_video(queue, video_path, settings)
+            print(f"Queued {os.path.basename(video_path)} as job {job}")
+        return
+    
+    scheduler = ResourceScheduler(max_cpus=args.max_cpus) if args.max_cpus else None
+    worker = StageWorker(queue, [stage.strip() for stage in args.stages.split(",")],
+                         scheduler=scheduler)
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        print("Worker stopped, its task was returned to the queue")
 
 def main():
     """Main function to start the application"""
+    args = parse_args()
+    
+    # Now import from src
+    try:
+        if args.watch:
+            run_watcher(args)
+            return
+        if args.worker or args.submit:
+            run_queue(args)
+            return
+        from gui import VideoTranslatorApp
+        print("✓ Modules imported successfully")
+    except ImportError as e:
+        print(f"✗ Import error: {e}")
+        print("Make sure you're running from the correct directory")
+        sys.exit(1)
+    
     app = VideoTranslatorApp()
     app.run()
 
@@ -6,8 +6,20 @@ __version__ = "1.0.0"
 __author__ = "Bassem Ben Nhila"
 __email__ = "bassembennhila1@gmail.com"
 
-from video_processor import VideoProcessor
+from video_processor import VideoProcessor, ModelPool
+from batch_transcriber import BatchTranscriber
 from subtitle_creator import SubtitleCreator
 from translator import TranslatorEngine
+from media_info import MediaInfo
 from utils import FileUtils, TimeUtils
+from fingerprint import AudioFingerprinter, FingerprintIndex
+from translation_memory import TranslationMemory
+from scheduler import ResourceScheduler
+from cancellation import CancellationToken, CancelledError
+from model_selector import ModelSelector
+from workspace import Workspace
+from task_queue import TaskQueue
+from pipeline import VideoPipeline
+from watcher import FolderWatcher
+from worker import StageWorker
 from gui import VideoTranslatorApp
\ No newline at end of file
@@ -0,0 +1,255 @@
+"""
+Batched Whisper transcription for the Video Translator application
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import nullcontext
+
+import torch
+import whisper
+from whisper.audio import N_SAMPLES, SAMPLE_RATE
+
+from cancellation import CancelledError
+from video_processor import ModelPool
+
+class BatchTranscriber:
+    """Decode 30-second windows of several queued files as one batch on a shared model.
+    Like whisper.transcribe, each window of a file starts where the last complete
+    segment of the previous one ended, so a file's windows are decoded in turn
+    and batches are formed across files. Windows are not conditioned on the
+    previous window's text."""
+
+    WINDOW_SECONDS = N_SAMPLES / SAMPLE_RATE
+    SECONDS_PER_TIMESTAMP = 0.02
+    # Same quality gates as whisper.transcribe
+    COMPRESSION_RATIO_THRESHOLD = 2.4
+    LOGPROB_THRESHOLD = -1.0
+    NO_SPEECH_THRESHOLD = 0.6
+    FALLBACK_TEMPERATURES = (0.2, 0.4, 0.6, 0.8, 1.0)
+
+    def __init__(self, model_size="small", batch_size=8, max_wait=0.5, language=None,
+                 scheduler=None, quantized=False):
+        self.model_size = model_size
+        self.quantized = quantized
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.language = language
+        self.scheduler = scheduler
+
+        self._windows = deque()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, audio_path, cancel_token=None, language=None):
+        """Queue a file for transcription, returns a Future with a Whisper-style result.
+        language overrides the transcriber's language for this file. Windows of a
+        cancelled file are dropped from the queue."""
+        language = language or self.language
+        future = Future()
+        try:
+            audio = whisper.load_audio(audio_path)
+        except Exception as e:
+            future.set_exception(Exception(f"Error transcribing audio: {e}"))
+            return future
+
+        if not len(audio):
+            future.set_result({"text": "", "segments": [], "language": language})
+            return future
+
+        job = {"future": future, "audio": audio, "segments": [], "language": None,
+               "decode_language": language, "cancel_token": cancel_token,
+               "queued": time.monotonic()}
+        with self._condition:
+            if self._closed:
+                raise Exception("Batch transcriber is closed")
+            self._queue_window(job, 0)
+        return future
+
+    def _queue_window(self, job, offset):
+        """Queue the window of job starting at sample offset, the condition must be held"""
+        audio = job["audio"]
+        self._windows.append({
+            "job": job,
+            "first": offset == 0,
+            "last": offset + N_SAMPLES >= len(audio),
+            "offset": offset / SAMPLE_RATE,
+            "duration": min(N_SAMPLES, len(audio) - offset) / SAMPLE_RATE,
+            "audio": audio[offset:offset + N_SAMPLES],
+            # Later windows keep the file's place in line instead of waiting max_wait again
+            "queued": job["queued"],
+        })
+        self._condition.notify()
+
+    def transcribe_files(self, audio_paths):
+        """Transcribe several files and return their results in order"""
+        futures = [self.submit(path) for path in audio_paths]
+        return [future.result() for future in futures]
+
+    def close(self):
+        """Finish queued windows and stop the decoding thread"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+
+    def _next_batch(self):
+        """Wait until a full batch is queued or the oldest window waited max_wait"""
+        with self._condition:
+            while True:
+                if self._windows:
+                    waited = time.monotonic() - self._windows[0]["queued"]
+                    if len(self._windows) >= self.batch_size or waited >= self.max_wait or self._closed:
+                        count = min(self.batch_size, len(self._windows))
+                        return [self._windows.popleft() for _ in range(count)]
+                    self._condition.wait(self.max_wait - waited)
+                elif self._closed:
+                    return None
+                else:
+                    self._condition.wait()
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            batch = [window for window in batch if not self._abandoned(window)]
+            if not batch:
+                continue
+            try:
+                results = self._decode_batch(batch)
+            except Exception as e:
+                for window in batch:
+                    future = window["job"]["future"]
+                    if not future.done():
+                        future.set_exception(Exception(f"Error transcribing audio: {e}"))
+                continue
+            for window, result in zip(batch, results):
+                self._route(window, result)
+
+    @staticmethod
+    def _abandoned(window):
+        """Check whether the window's file was cancelled, failing its future"""
+        job = window["job"]
+        token = job["cancel_token"]
+        if token is None or not token.cancelled:
+            return False
+        if not job["future"].done():
+            job["future"].set_exception(CancelledError(token.reason))
+        return True
+
+    def _decode_batch(self, batch):
+        """Run the encoder and decoder over all windows of the batch at once"""
+        stage = self.scheduler.stage("transcribe") if self.scheduler else nullcontext()
+        with stage as threads, ModelPool.acquire(self.model_size, self.quantized) as model:
+            if threads:
+                torch.set_num_threads(threads)
+            mel = torch.stack([
+                whisper.log_mel_spectrogram(whisper.pad_or_trim(window["audio"]),
+                                            n_mels=model.dims.n_mels)
+                for window in batch
+            ]).to(model.device)
+            # Windows of files with a known language are decoded in it, the others detect theirs
+            groups = {}
+            for idx, window in enumerate(batch):
+                groups.setdefault(window["job"]["decode_language"], []).append(idx)
+            results = [None] * len(batch)
+            for language, indices in groups.items():
+                options = whisper.DecodingOptions(language=language, fp16=False)
+                for idx, result in zip(indices, whisper.decode(model, mel[indices], options)):
+                    results[idx] = result
+
+            # Retry windows that fail the quality gates alone with sampling
+            for idx, result in enumerate(results):
+                temperatures = iter(self.FALLBACK_TEMPERATURES)
+                while self._needs_fallback(result):
+                    temperature = next(temperatures, None)
+                    if temperature is None:
+                        break
+                    retry = whisper.DecodingOptions(language=result.language, fp16=False,
+                                                    temperature=temperature)
+                    result = whisper.decode(model, mel[idx], retry)
+                results[idx] = result
+
+            segments = [self._parse_segments(model, window, result)
+                        for window, result in zip(batch, results)]
+        return list(zip(segments, [result.language for result in results]))
+
+    def _needs_fallback(self, result):
+        return (result.compression_ratio > self.COMPRESSION_RATIO_THRESHOLD
+                or result.avg_logprob < self.LOGPROB_THRESHOLD)
+
+    def _parse_segments(self, model, window, result):
+        """Turn timestamp tokens of one window into segments on the file timeline.
+        Returns the segments and how many seconds of the window they cover: a
+        segment cut off by the window's end is dropped and decoded again from
+        its start in the next window."""
+        if (result.no_speech_prob > self.NO_SPEECH_THRESHOLD
+                and result.avg_logprob < self.LOGPROB_THRESHOLD):
+            return [], window["duration"]
+
+        tokenizer = whisper.tokenizer.get_tokenizer(model.is_multilingual,
+                                                    num_languages=model.num_languages,
+                                                    language=result.language, task="transcribe")
+        timestamp_begin = tokenizer.timestamp_begin
+        segments = []
+        start = None
+        text_tokens = []
+
+        def close_segment(end):
+            text = tokenizer.decode(text_tokens).strip()
+            if text:
+                segments.append({
+                    "start": window["offset"] + (start or 0.0),
+                    "end": window["offset"] + min(end, window["duration"]),
+                    "text": text,
+                })
+
+        for token in result.tokens:
+            if token >= timestamp_begin:
+                time_point = (token - timestamp_begin) * self.SECONDS_PER_TIMESTAMP
+                if start is None:
+                    start = time_point
+                elif text_tokens:
+                    close_segment(time_point)
+                    start = None
+                    text_tokens = []
+                else:
+                    start = time_point
+            elif token < tokenizer.eot:
+                text_tokens.append(token)
+
+        complete = segments and segments[-1]["end"] > window["offset"]
+        if text_tokens and complete and not window["last"]:
+            # Seek to the end of the last complete segment, as whisper.transcribe does
+            return segments, segments[-1]["end"] - window["offset"]
+        if text_tokens:
+            close_segment(window["duration"])
+        return segments, window["duration"]
+
+    def _route(self, window, decoded):
+        """Store a window's segments, queue the file's next window or resolve
+        the file once its audio is decoded"""
+        (segments, covered), language = decoded
+        job = window["job"]
+        job["segments"].extend(segments)
+        if window["first"]:
+            job["language"] = language
+        offset = int(round((window["offset"] + covered) * SAMPLE_RATE))
+        if not window["last"] and offset < len(job["audio"]):
+            with self._condition:
+                self._queue_window(job, offset)
+            return
+        if not job["future"].done():
+            all_segments = job["segments"]
+            for idx, segment in enumerate(all_segments):
+                segment["id"] = idx
+            job["future"].set_result({
+                "text": " ".join(segment["text"] for segment in all_segments),
+                "segments": all_segments,
+                "language": job["language"],
+            })
@@ -0,0 +1,116 @@
+"""
+Cooperative cancellation for the Video Translator application
+"""
+
+import subprocess
+import threading
+from contextlib import contextmanager
+
+class CancelledError(Exception):
+    """Raised inside a stage once its job was cancelled or ran out of time"""
+
+class CancellationToken:
+    """Cancellation shared by the stages of a job.
+
+    Stages check the token between units of work and register their child
+    processes, which are terminated as soon as the token is cancelled. A
+    child token follows its parent and can have its own deadline, e.g. a
+    per-stage timeout."""
+
+    KILL_GRACE = 5.0   # Seconds a terminated process gets before it is killed
+
+    def __init__(self, timeout=None, parent=None, timeout_reason="Timed out"):
+        self.reason = None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._processes = set()
+        self._children = set()
+        self._parent = parent
+        self._timer = None
+        if timeout:
+            self._timer = threading.Timer(timeout, self.cancel, args=(timeout_reason,))
+            self._timer.daemon = True
+            self._timer.start()
+        if parent:
+            parent._attach(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def child(self, timeout=None, timeout_reason="Timed out"):
+        """Token cancelled with this one, or on its own after timeout seconds"""
+        return CancellationToken(timeout, self, timeout_reason)
+
+    def close(self):
+        """Stop the deadline and detach from the parent"""
+        if self._timer:
+            self._timer.cancel()
+        if self._parent:
+            with self._parent._lock:
+                self._parent._children.discard(self)
+
+    def _attach(self, child):
+        with self._lock:
+            if not self._event.is_set():
+                self._children.add(child)
+                return
+        child.cancel(self.reason)
+
+    def cancel(self, reason="Cancelled"):
+        """Cancel the job, terminating its registered processes"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            children = list(self._children)
+            processes = list(self._processes)
+        for child in children:
+            child.cancel(reason)
+        for process in processes:
+            self._terminate(process)
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        """Raise CancelledError if the job was cancelled"""
+        if self._event.is_set():
+            raise CancelledError(self.reason)
+
+    def wait(self, timeout=None):
+        """Sleep until cancelled or timeout, True when cancelled"""
+        return self._event.wait(timeout)
+
+    @contextmanager
+    def process(self, process):
+        """Terminate a child process if the token is cancelled while it runs"""
+        with self._lock:
+            cancelled = self._event.is_set()
+            if not cancelled:
+                self._processes.add(process)
+        if cancelled:
+            self._terminate(process)
+        try:
+            yield process
+        finally:
+            with self._lock:
+                self._processes.discard(process)
+
+    @staticmethod
+    def _terminate(process):
+        if process.poll() is not None:
+            return
+        process.terminate()
+
+        def kill_if_stuck():
+            try:
+                process.wait(CancellationToken.KILL_GRACE)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+        threading.Thread(target=kill_if_stuck, daemon=True).start()
@@ -0,0 +1,244 @@
+"""
+Audio fingerprinting functions for the Video Translator application
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import wave
+from collections import Counter, defaultdict
+from contextlib import closing
+
+import numpy as np
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.expanduser("~"), ".video_translator", "fingerprints.db")
+
+class AudioFingerprinter:
+    """Compute spectral-peak pair hashes from 16 kHz mono PCM"""
+
+    SAMPLE_RATE = 16000
+    FFT_SIZE = 1024
+    HOP_SIZE = 512                 # 32 ms per frame
+    BLOCK_SECONDS = 60             # Audio read from disk at a time
+    # FFT bin ranges, one peak candidate per band and frame
+    BANDS = [(4, 16), (16, 32), (32, 64), (64, 128), (128, 256), (256, 512)]
+    FAN_OUT = 5                    # Pairs formed from each anchor peak
+    MAX_DELTA = 63                 # Max frames between paired peaks (6 bits)
+
+    @staticmethod
+    def frame_seconds():
+        """Duration of one fingerprint frame"""
+        return AudioFingerprinter.HOP_SIZE / AudioFingerprinter.SAMPLE_RATE
+
+    @staticmethod
+    def fingerprint_file(wav_path):
+        """Fingerprint a 16 kHz mono PCM WAV file, returns (hashes, duration)"""
+        try:
+            hashes = []
+            frame_offset = 0
+            # Samples after the last full frame, they start the next block's first frame
+            carry = np.zeros(0, np.float32)
+            with wave.open(wav_path, "rb") as wav:
+                if wav.getframerate() != AudioFingerprinter.SAMPLE_RATE or wav.getnchannels() != 1:
+                    raise ValueError("expected 16 kHz mono audio")
+                total_frames = wav.getnframes()
+                block_size = AudioFingerprinter.BLOCK_SECONDS * AudioFingerprinter.SAMPLE_RATE
+                while True:
+                    data = wav.readframes(block_size)
+                    if not data:
+                        break
+                    samples = np.frombuffer(data, np.int16).astype(np.float32) / 32768.0
+                    samples = np.concatenate((carry, samples))
+                    block_hashes, frame_count = AudioFingerprinter.fingerprint_samples(samples)
+                    hashes.extend((h, frame + frame_offset) for h, frame in block_hashes)
+                    # Keep frame numbers on one hop grid across blocks
+                    consumed = min(frame_count * AudioFingerprinter.HOP_SIZE, len(samples))
+                    carry = samples[consumed:]
+                    frame_offset += consumed // AudioFingerprinter.HOP_SIZE
+            return hashes, total_frames / AudioFingerprinter.SAMPLE_RATE
+        except Exception as e:
+            raise Exception(f"Error fingerprinting audio: {e}")
+
+    @staticmethod
+    def fingerprint_samples(samples):
+        """Return ([(hash, frame), ...], frame_count) for a block of samples"""
+        fft_size = AudioFingerprinter.FFT_SIZE
+        hop = AudioFingerprinter.HOP_SIZE
+        frame_count = max(0, (len(samples) - fft_size) // hop + 1)
+        if frame_count == 0:
+            return [], len(samples) // hop
+
+        # Log-magnitude spectrogram
+        frames = np.lib.stride_tricks.sliding_window_view(samples, fft_size)[::hop][:frame_count]
+        spectrum = np.abs(np.fft.rfft(frames * np.hanning(fft_size), axis=1))
+        spectrum = np.log1p(spectrum * 100.0)
+
+        # Strongest bin per band, kept when it stands out from the block average
+        peaks_t = []
+        peaks_f = []
+        for low, high in AudioFingerprinter.BANDS:
+            band = spectrum[:, low:high]
+            bins = np.argmax(band, axis=1)
+            values = band[np.arange(frame_count), bins]
+            keep = values > values.mean() + 0.5 * values.std()
+            peaks_t.append(np.nonzero(keep)[0])
+            peaks_f.append(bins[keep] + low)
+        peaks_t = np.concatenate(peaks_t)
+        peaks_f = np.concatenate(peaks_f)
+        order = np.lexsort((peaks_f, peaks_t))
+        peaks_t = peaks_t[order]
+        peaks_f = peaks_f[order]
+
+        # Pair each anchor with the next peaks in time: hash = f1 | f2 | dt
+        hashes = []
+        count = len(peaks_t)
+        for i in range(count):
+            t1 = peaks_t[i]
+            paired = 0
+            for j in range(i + 1, count):
+                dt = peaks_t[j] - t1
+                if dt == 0:
+                    continue
+                if dt > AudioFingerprinter.MAX_DELTA or paired >= AudioFingerprinter.FAN_OUT:
+                    break
+                hashes.append((int(peaks_f[i]) << 16 | int(peaks_f[j]) << 6 | int(dt), int(t1)))
+                paired += 1
+        return hashes, frame_count
+
+class FingerprintIndex:
+    """SQLite index of fingerprints and the transcripts produced for them"""
+
+    MIN_MATCHES = 20       # Aligned hashes needed to accept a match
+    MIN_RATIO = 0.5        # Share of the query hashes that must align
+    COVERAGE_BINS = 10     # The query is split into this many parts...
+    MIN_COVERAGE = 0.8     # ...and aligned hashes must show up in this share of them
+    MAX_CANDIDATES = 5     # Best voted offsets checked for coverage
+    TOLERANCE = 2.0        # Seconds the query may overhang the stored audio
+    QUERY_CHUNK = 500
+
+    def __init__(self, db_path=DEFAULT_INDEX_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS media ("
+                         "id INTEGER PRIMARY KEY, source TEXT, duration REAL, result TEXT)")
+            conn.execute("CREATE TABLE IF NOT EXISTS hashes ("
+                         "hash INTEGER, media_id INTEGER, frame INTEGER)")
+            conn.execute("CREATE INDEX IF NOT EXISTS hashes_hash ON hashes (hash)")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def add(self, source, hashes, duration, result):
+        """Store a transcription result under its fingerprint"""
+        slim_result = {
+            "text": result.get("text", ""),
+            "language": result.get("language"),
+            "segments": [FingerprintIndex._slim_segment(s) for s in result.get("segments", [])],
+        }
+        with self._lock, closing(self._connect()) as conn, conn:
+            cursor = conn.execute("INSERT INTO media (source, duration, result) VALUES (?, ?, ?)",
+                                  (source, duration, json.dumps(slim_result, ensure_ascii=False)))
+            media_id = cursor.lastrowid
+            conn.executemany("INSERT INTO hashes (hash, media_id, frame) VALUES (?, ?, ?)",
+                             ((h, media_id, frame) for h, frame in hashes))
+        return media_id
+
+    def find(self, hashes, duration):
+        """Find stored audio containing the query, returns a shifted result or None"""
+        if not hashes:
+            return None
+
+        query_frames = defaultdict(list)
+        for h, frame in hashes:
+            query_frames[h].append(frame)
+
+        # Vote on (media, time offset): true duplicates pile up on one offset
+        votes = Counter()
+        keys = list(query_frames)
+        with closing(self._connect()) as conn:
+            for i in range(0, len(keys), self.QUERY_CHUNK):
+                chunk = keys[i:i + self.QUERY_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute("SELECT hash, media_id, frame FROM hashes "
+                                    f"WHERE hash IN ({placeholders})", chunk)
+                for h, media_id, frame in rows:
+                    for query_frame in query_frames[h]:
+                        votes[(media_id, frame - query_frame)] += 1
+
+            # A shared intro or recap lines up too, but only over part of the query
+            match = None
+            for (media_id, delta), count in votes.most_common(self.MAX_CANDIDATES):
+                if count < self.MIN_MATCHES or count < self.MIN_RATIO * len(hashes):
+                    break
+                if self._covers(conn, media_id, delta, query_frames, duration):
+                    match = media_id, delta
+                    break
+            if match is None:
+                return None
+            media_id, delta = match
+
+            row = conn.execute("SELECT source, duration, result FROM media WHERE id = ?",
+                               (media_id,)).fetchone()
+
+        source, stored_duration, result_json = row
+        offset = delta * AudioFingerprinter.frame_seconds()
+        # The stored transcript must cover the whole query
+        if offset < -self.TOLERANCE or offset + duration > stored_duration + self.TOLERANCE:
+            return None
+
+        result = self.shift_result(json.loads(result_json), offset, duration)
+        result["source"] = source
+        result["offset"] = offset
+        return result
+
+    def _covers(self, conn, media_id, delta, query_frames, duration):
+        """Check that hashes aligned at delta are spread over the whole query"""
+        frame_count = max(1.0, duration / AudioFingerprinter.frame_seconds())
+        to_bin = lambda frame: min(self.COVERAGE_BINS - 1,
+                                   int(frame * self.COVERAGE_BINS / frame_count))
+        # Parts without any hashes (silence) can't align and are not counted
+        query_bins = {to_bin(frame) for frames in query_frames.values() for frame in frames}
+        aligned_bins = set()
+        keys = list(query_frames)
+        for i in range(0, len(keys), self.QUERY_CHUNK):
+            chunk = keys[i:i + self.QUERY_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute("SELECT hash, frame FROM hashes "
+                                f"WHERE hash IN ({placeholders}) AND media_id = ?",
+                                chunk + [media_id])
+            for h, frame in rows:
+                if frame - delta in query_frames[h]:
+                    aligned_bins.add(to_bin(frame - delta))
+        return len(aligned_bins) >= self.MIN_COVERAGE * len(query_bins)
+
+    @staticmethod
+    def _slim_segment(segment):
+        slim = {"start": segment["start"], "end": segment["end"], "text": segment["text"]}
+        if "words" in segment:
+            slim["words"] = [{"word": w["word"], "start": w["start"], "end": w["end"]}
+                             for w in segment["words"]]
+        return slim
+
+    @staticmethod
+    def shift_result(result, offset, duration):
+        """Move segments from the stored timeline onto the query timeline"""
+        segments = []
+        for segment in result["segments"]:
+            start = segment["start"] - offset
+            end = segment["end"] - offset
+            if end <= 0 or start >= duration:
+                continue
+            shifted = {"start": max(0.0, start), "end": min(duration, end),
+                       "text": segment["text"]}
+            if "words" in segment:
+                shifted["words"] = [dict(w, start=max(0.0, w["start"] - offset),
+                                         end=min(duration, w["end"] - offset))
+                                    for w in segment["words"]]
+            segments.append(shifted)
+        text = " ".join(segment["text"].strip() for segment in segments)
+        return {"text": text, "language": result.get("language"), "segments": segments}
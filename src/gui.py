@@ -2,28 +2,37 @@
 Graphical User Interface for the Video Translator application
 """
 
-import os
 import threading
 import tkinter as tk
 from tkinter import filedialog, messagebox, scrolledtext, ttk
-import time
 
-from video_processor import VideoProcessor
+from cancellation import CancellationToken, CancelledError
+from fingerprint import DEFAULT_INDEX_PATH
+from pipeline import VideoPipeline
+from scheduler import ResourceScheduler
+from translation_memory import DEFAULT_MEMORY_PATH
 from translator import TranslatorEngine
-from subtitle_creator import SubtitleCreator
-from utils import FileUtils, TimeUtils, SystemChecker
+from utils import TimeUtils, SystemChecker
+from workspace import Workspace
 
 class VideoTranslatorApp:
     """Main application GUI"""
     
+    PREVIEW_CHARS = 100000  # Longer texts are only shown partially
+    CLOSE_TIMEOUT = 10      # Seconds a cancelled job gets to clean up on exit
+    
     def __init__(self):
         self.root = tk.Tk()
         self.root.title("Video Translator - Add Subtitles to Video")
         self.root.geometry("1000x850")
         
         self.processing = False
+        self.closing = False
+        self.cancel_token = None
+        self.worker_thread = None
         self.current_progress = 0
         self.translator = TranslatorEngine()
+        self.scheduler = ResourceScheduler()
         
         self._setup_fonts()
         self._create_widgets()
@@ -31,10 +40,14 @@ class VideoTranslatorApp:
         
         # Check system requirements
         self._check_requirements()
+        Workspace.remove_stale()
     
     def run(self):
         """Run the application"""
         self.root.mainloop()
+        # Let a cancelled job remove its temporary files before exiting
+        if self.worker_thread:
+            self.worker_thread.join(self.CLOSE_TIMEOUT)
     
     def _setup_fonts(self):
         """Setup fonts for the application"""
@@ -95,9 +108,24 @@ class VideoTranslatorApp:
         tk.Label(model_frame, text="Whisper Model:", font=self.label_font).pack()
         self.model_var = tk.StringVar(value="small")
         model_menu = tk.OptionMenu(model_frame, self.model_var, 
-                                 "tiny", "base", "small", "medium", "large")
+                                 "auto", "tiny", "base", "small", "medium", "large")
         model_menu.config(font=self.button_font, width=8)
         model_menu.pack()
+        
+        budget_frame = tk.Frame(model_frame)
+        budget_frame.pack()
+        tk.Label(budget_frame, text="Auto budget:", font=self.label_font).pack(side=tk.LEFT)
+        self.budget_var = tk.StringVar(value="")
+        tk.Entry(budget_frame, textvariable=self.budget_var, width=6, 
+                font=self.label_font).pack(side=tk.LEFT, padx=2)
+        
+        self.quantized_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(model_frame, text="Int8 CPU mode", 
+                      variable=self.quantized_var, font=self.label_font).pack()
+        
+        self.streaming_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(model_frame, text="Long recording\n(streaming)", 
+                      variable=self.streaming_var, font=self.label_font).pack()
     
     def _create_language_settings(self, parent):
         """Create language settings frame"""
@@ -123,6 +151,14 @@ class VideoTranslatorApp:
                                    variable=self.create_video_var, font=self.label_font)
         video_check.pack(anchor=tk.W)
         
+        self.reuse_var = tk.BooleanVar(value=True)
+        tk.Checkbutton(output_frame, text="Reuse transcripts of duplicate audio", 
+                      variable=self.reuse_var, font=self.label_font).pack(anchor=tk.W)
+        
+        self.memory_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(output_frame, text="Reuse translations of similar lines", 
+                      variable=self.memory_var, font=self.label_font).pack(anchor=tk.W)
+        
         self.subtitle_style_var = tk.StringVar(value="burned")
         style_frame = tk.Frame(output_frame)
         style_frame.pack()
@@ -133,6 +169,27 @@ class VideoTranslatorApp:
         tk.Radiobutton(style_frame, text="Subtitle file only", 
                       variable=self.subtitle_style_var, 
                       value="separate", font=self.label_font).pack(side=tk.LEFT, padx=5)
+        
+        # Time range
+        self._create_range_control(output_frame)
+    
+    def _create_range_control(self, parent):
+        """Create time range and preview controls"""
+        range_frame = tk.Frame(parent)
+        range_frame.pack(fill=tk.X, pady=2)
+        
+        tk.Label(range_frame, text="Range:", font=self.label_font).pack(side=tk.LEFT)
+        self.start_var = tk.StringVar(value="")
+        tk.Entry(range_frame, textvariable=self.start_var, width=8, 
+                font=self.label_font).pack(side=tk.LEFT, padx=2)
+        tk.Label(range_frame, text="to", font=self.label_font).pack(side=tk.LEFT)
+        self.end_var = tk.StringVar(value="")
+        tk.Entry(range_frame, textvariable=self.end_var, width=8, 
+                font=self.label_font).pack(side=tk.LEFT, padx=2)
+        
+        self.preview_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(parent, text="Fast preview (low resolution)", 
+                      variable=self.preview_var, font=self.label_font).pack(anchor=tk.W)
     
     def _create_timing_settings(self, parent):
         """Create timing settings frame"""
@@ -194,6 +251,10 @@ class VideoTranslatorApp:
                                  "basic", "delayed", "smart")
         sync_menu.config(font=self.button_font, width=10)
         sync_menu.pack()
+        
+        self.word_timing_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(sync_frame, text="Split cues at word timestamps", 
+                      variable=self.word_timing_var, font=self.label_font).pack()
     
     def _create_progress_frame(self):
         """Create progress bar frame"""
@@ -331,7 +392,9 @@ class VideoTranslatorApp:
             return
         
         self.update_progress(0, "Starting processing...")
-        threading.Thread(target=self.process_video, args=(path,), daemon=True).start()
+        self.worker_thread = threading.Thread(target=self.process_video, args=(path,), 
+                                              daemon=True)
+        self.worker_thread.start()
     
     def log(self, msg):
         """Add message to log"""
@@ -351,141 +414,37 @@ class VideoTranslatorApp:
     def process_video(self, video_path):
         """Process video to translated text and create video with subtitles"""
         self.processing = True
+        self.cancel_token = CancellationToken()
         self.open_btn.config(state=tk.DISABLED)
         
-        temp_files = []
-        
         try:
             self.clear_texts()
             self.log("=" * 60)
-            self.log("Starting video processing...")
-            self.log(f"File: {os.path.basename(video_path)}")
-            self.log(f"Size: {FileUtils.get_file_size(video_path):.1f} MB")
-            
-            # 1) Extract audio
-            self.update_progress(10, "Extracting audio...")
-            self.log("Extracting audio from video...")
-            
-            audio = VideoProcessor.extract_audio(video_path, 
-                                               progress_callback=self.update_progress)
-            temp_files.append(audio)
-            self.log("✓ Audio extracted successfully")
             
-            # 2) Convert audio to text
-            model_size = self.model_var.get()
-            self.update_progress(30, f"Loading model ({model_size})...")
-            self.log(f"Converting audio to text using {model_size} model...")
-            
-            result = VideoProcessor.transcribe_with_whisper(audio, model_size, 
-                                                          progress_callback=self.update_progress)
-            transcript = result.get("text", "").strip()
-            segments = result.get("segments", [])
-            
-            self.log(f"✓ Audio converted to text ({len(transcript)} characters)")
-            self.log(f"✓ {len(segments)} time segments identified")
-            
-            if segments:
-                total_duration = segments[-1]['end'] - segments[0]['start']
-                self.log(f"✓ Video duration: {total_duration:.1f} seconds")
-            
-            # Display original text
-            self.original_text.insert(tk.END, transcript)
-            self.notebook.select(0)
-            
-            # 3) Translation
-            if transcript:
-                dest_lang = self.lang_var.get()
-                self.update_progress(70, f"Translating to {dest_lang}...")
-                self.log(f"Translating text to {dest_lang} language...")
-                
-                translated = self.translator.translate_text(transcript, dest_lang, 
-                                                          progress_callback=self.update_progress)
-                self.log("✓ Translation completed successfully")
-                self.log(f"✓ Translated text length: {len(translated)} characters")
-                
-                # Display translated text
-                self.translated_text.insert(tk.END, translated)
-                self.notebook.select(1)
-                
-                # 4) Save text files
-                self.update_progress(90, "Saving text files...")
-                base_name = FileUtils.get_base_name(video_path)
-                transcript_file = f"{base_name}_transcript.txt"
-                translation_file = f"{base_name}_translation_{dest_lang}.txt"
-                
-                with open(transcript_file, "w", encoding="utf-8") as f:
-                    f.write(transcript)
-                with open(translation_file, "w", encoding="utf-8") as f:
-                    f.write(translated)
-                
-                self.log(f"✓ Original text saved to: {transcript_file}")
-                self.log(f"✓ Translation saved to: {translation_file}")
-                
-                # 5) Create subtitle and video files
-                if self.create_video_var.get():
-                    self.log("-" * 40)
-                    self.log("Creating subtitle and video files...")
-                    
-                    # Use appropriate method for creating subtitles
-                    srt_file = f"{base_name}_translation_{dest_lang}.srt"
-                    sync_method = self.sync_method_var.get()
-                    
-                    if sync_method == "basic":
-                        self.log("Using basic method (no delay)...")
-                        SubtitleCreator.create_basic_srt(segments, translated, srt_file, 
-                                                        progress_callback=self.update_progress)
-                    elif sync_method == "delayed":
-                        delay_amount = self.delay_var.get()
-                        self.log(f"Using delay method ({delay_amount} seconds)...")
-                        SubtitleCreator.create_delayed_srt(segments, translated, srt_file, 
-                                                         delay_seconds=delay_amount,
-                                                         progress_callback=self.update_progress)
-                    else:  # smart
-                        delay_amount = self.delay_var.get()
-                        speed_factor = self.speed_var.get()
-                        self.log(f"Using smart sync (delay: {delay_amount}s, speed: {speed_factor})...")
-                        SubtitleCreator.create_smart_srt(segments, translated, srt_file,
-                                                        sync_adjustment=delay_amount,
-                                                        reading_speed=speed_factor,
-                                                        progress_callback=self.update_progress)
-                    
-                    self.log(f"✓ Subtitle file created: {srt_file}")
-                    
-                    # If user requested video with burned subtitles
-                    if self.subtitle_style_var.get() == "burned":
-                        output_video = f"{base_name}_with_subtitles_{dest_lang}.mp4"
-                        self.log("Burning subtitles to video...")
-                        VideoProcessor.burn_subtitles(video_path, srt_file, output_video, 
-                                                     self.update_progress)
-                        self.log(f"✓ Video with subtitles created: {output_video}")
-                        
-                        messagebox.showinfo("✅ Processing Complete", 
-                                          f"Video processed successfully!\n\n"
-                                          f"Files created:\n"
-                                          f"• {transcript_file}\n"
-                                          f"• {translation_file}\n"
-                                          f"• {srt_file}\n"
-                                          f"• {output_video}")
-                    else:
-                        messagebox.showinfo("✅ Processing Complete", 
-                                          f"Video processed successfully!\n\n"
-                                          f"Files created:\n"
-                                          f"• {transcript_file}\n"
-                                          f"• {translation_file}\n"
-                                          f"• {srt_file}")
-                else:
-                    messagebox.showinfo("✅ Processing Complete", 
-                                      f"Video processed successfully!\n\n"
-                                      f"Files created:\n"
-                                      f"• {transcript_file}\n"
-                                      f"• {translation_file}")
+            pipeline = VideoPipeline(translator=self.translator,
+                                     progress_callback=self.update_progress,
+                                     log_callback=self.log,
+                                     scheduler=self.scheduler,
+                                     cancel_token=self.cancel_token)
+            result = pipeline.process(video_path, self._get_settings(),
+                                      transcript_callback=self._show_transcript,
+                                      translation_callback=self._show_translation)
             
+            if result["files"]:
+                files_list = "\n".join(f"• {path}" for path in result["files"])
+                messagebox.showinfo("✅ Processing Complete", 
+                                  f"Video processed successfully!\n\n"
+                                  f"Files created:\n{files_list}")
             else:
-                self.update_progress(100, "No text found")
-                self.log("⚠ No text found for translation")
                 messagebox.showwarning("Warning", "No text found in the video")
         
         except Exception as e:
+            if self.closing:
+                return  # The window is gone, nothing to report to
+            if isinstance(e, CancelledError):
+                self.update_progress(0, "Processing cancelled")
+                self.log(f"⚠ Processing cancelled: {e}")
+                return
             error_msg = f"Error occurred: {str(e)}"
             self.update_progress(0, "Processing error")
             self.log(f"❌ {error_msg}")
@@ -493,21 +452,57 @@ class VideoTranslatorApp:
             messagebox.showerror("Error", error_msg)
         
         finally:
-            # Cleanup
-            self.log("Cleaning temporary files...")
-            for temp_file in temp_files:
-                FileUtils.safe_delete(temp_file)
-                self.log(f"✓ Deleted: {temp_file}")
-            
             self.processing = False
-            self.open_btn.config(state=tk.NORMAL)
-            self.log("--- Processing finished ---")
-            self.log("=" * 60)
+            if not self.closing:
+                self.open_btn.config(state=tk.NORMAL)
+                self.log("--- Processing finished ---")
+                self.log("=" * 60)
+    
+    def _get_settings(self):
+        """Collect pipeline settings from the widgets"""
+        return VideoPipeline.build_settings({
+            "model_size": self.model_var.get(),
+            "dest_lang": self.lang_var.get(),
+            "create_video": self.create_video_var.get(),
+            "subtitle_style": self.subtitle_style_var.get(),
+            "sync_method": self.sync_method_var.get(),
+            "delay": self.delay_var.get(),
+            "reading_speed": self.speed_var.get(),
+            "streaming": self.streaming_var.get(),
+            "quantized": self.quantized_var.get(),
+            "time_budget": self.budget_var.get(),
+            "word_timing": self.word_timing_var.get(),
+            "fingerprint_index": DEFAULT_INDEX_PATH if self.reuse_var.get() else "",
+            "translation_memory": DEFAULT_MEMORY_PATH if self.memory_var.get() else "",
+            "start_time": self.start_var.get(),
+            "end_time": self.end_var.get(),
+            "preview": self.preview_var.get(),
+        })
+    
+    def _show_transcript(self, transcript):
+        """Display original text"""
+        self.original_text.insert(tk.END, self._preview(transcript))
+        self.notebook.select(0)
+    
+    def _show_translation(self, translated):
+        """Display translated text"""
+        self.translated_text.insert(tk.END, self._preview(translated))
+        self.notebook.select(1)
+    
+    def _preview(self, text):
+        """Limit text shown in the widgets, the full text is saved to disk"""
+        if len(text) <= self.PREVIEW_CHARS:
+            return text
+        return (text[:self.PREVIEW_CHARS] + 
+                f"\n\n[... {len(text) - self.PREVIEW_CHARS} more characters in the saved file]")
     
     def _on_closing(self):
         """Handle window closing"""
         if self.processing:
             if messagebox.askokcancel("Quit", "Processing in progress. Are you sure you want to quit?"):
+                # Stop ffmpeg, Whisper and translation instead of leaving them running
+                self.closing = True
+                self.cancel_token.cancel("Application closed")
                 self.root.destroy()
         else:
             self.root.destroy()
\ No newline at end of file
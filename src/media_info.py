@@ -0,0 +1,145 @@
+"""
+Media probing functions for the Video Translator application
+"""
+
+import json
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+
+class MediaInfo:
+    """Stream metadata of a media file, probed once with ffprobe and cached"""
+
+    CACHE_SIZE = 256
+    WHISPER_SAMPLE_RATE = 16000
+
+    _cache = OrderedDict()   # (path, size, mtime) -> MediaInfo
+    _lock = threading.Lock()
+
+    def __init__(self, path, data):
+        self.path = path
+        self.format = data.get("format", {})
+        self.streams = data.get("streams", [])
+        self.audio_streams = [s for s in self.streams if s.get("codec_type") == "audio"]
+        self.video_streams = [s for s in self.streams if s.get("codec_type") == "video"
+                              and not s.get("disposition", {}).get("attached_pic")]
+        self._keyframes = None
+
+    @staticmethod
+    def probe(path):
+        """Get the metadata of a file, reusing the cached probe if it is unchanged"""
+        try:
+            stat = os.stat(path)
+            key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        except OSError as e:
+            raise Exception(f"Error probing media: {e}")
+
+        with MediaInfo._lock:
+            if key in MediaInfo._cache:
+                MediaInfo._cache.move_to_end(key)
+                return MediaInfo._cache[key]
+
+        try:
+            cmd = [
+                "ffprobe", "-v", "error", "-print_format", "json",
+                "-show_format", "-show_streams", path
+            ]
+            result = subprocess.run(cmd, stdout=subprocess.PIPE,
+                                  stderr=subprocess.PIPE, check=True)
+            info = MediaInfo(path, json.loads(result.stdout.decode("utf-8")))
+        except subprocess.CalledProcessError as e:
+            raise Exception(f"Error probing media: {e.stderr.decode(errors='replace').strip()}")
+        except (OSError, ValueError) as e:
+            raise Exception(f"Error probing media: {e}")
+
+        with MediaInfo._lock:
+            MediaInfo._cache[key] = info
+            while len(MediaInfo._cache) > MediaInfo.CACHE_SIZE:
+                MediaInfo._cache.popitem(last=False)
+        return info
+
+    @property
+    def duration(self):
+        """Duration in seconds, from the container or the longest stream"""
+        try:
+            return float(self.format["duration"])
+        except (KeyError, ValueError):
+            durations = [float(s["duration"]) for s in self.streams if s.get("duration")]
+            return max(durations) if durations else 0.0
+
+    @property
+    def audio_stream(self):
+        """The audio stream to transcribe: the default one, else the one with most channels"""
+        if not self.audio_streams:
+            return None
+        defaults = [s for s in self.audio_streams if s.get("disposition", {}).get("default")]
+        candidates = defaults or self.audio_streams
+        return max(candidates, key=lambda s: s.get("channels", 0))
+
+    @property
+    def audio_stream_index(self):
+        """Index of audio_stream among the audio streams, for ffmpeg's -map 0:a:N"""
+        stream = self.audio_stream
+        return self.audio_streams.index(stream) if stream else None
+
+    @property
+    def audio_codec(self):
+        stream = self.audio_stream
+        return stream.get("codec_name") if stream else None
+
+    @property
+    def sample_rate(self):
+        stream = self.audio_stream
+        return int(stream.get("sample_rate", 0)) if stream else 0
+
+    @property
+    def channels(self):
+        stream = self.audio_stream
+        return stream.get("channels", 0) if stream else 0
+
+    @property
+    def video_codec(self):
+        return self.video_streams[0].get("codec_name") if self.video_streams else None
+
+    @property
+    def has_audio(self):
+        return bool(self.audio_streams)
+
+    def is_whisper_ready(self):
+        """Check if the file already is 16 kHz mono PCM WAV and needs no conversion"""
+        return (self.format.get("format_name") == "wav"
+                and len(self.audio_streams) == 1
+                and self.audio_codec == "pcm_s16le"
+                and self.sample_rate == self.WHISPER_SAMPLE_RATE
+                and self.channels == 1)
+
+    @property
+    def keyframes(self):
+        """Keyframe timestamps of the first video stream, read on first use"""
+        if self._keyframes is None:
+            self._keyframes = []
+            if self.video_streams:
+                cmd = [
+                    "ffprobe", "-v", "error", "-select_streams", "v:0",
+                    "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", self.path
+                ]
+                result = subprocess.run(cmd, stdout=subprocess.PIPE,
+                                      stderr=subprocess.DEVNULL, check=True)
+                for line in result.stdout.decode().splitlines():
+                    pts_time, _, flags = line.partition(",")
+                    if "K" in flags and pts_time not in ("", "N/A"):
+                        self._keyframes.append(float(pts_time))
+                self._keyframes.sort()
+        return self._keyframes
+
+    def describe(self):
+        """Short human readable summary"""
+        parts = [f"{self.duration:.1f}s"]
+        if self.video_codec:
+            parts.append(f"video {self.video_codec}")
+        if self.audio_stream:
+            parts.append(f"audio {self.audio_codec} {self.sample_rate} Hz "
+                         f"{self.channels} ch (stream {self.audio_stream_index + 1} "
+                         f"of {len(self.audio_streams)})")
+        return ", ".join(parts)
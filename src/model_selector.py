@@ -0,0 +1,94 @@
+"""
+Automatic Whisper model selection for the Video Translator application
+"""
+
+import json
+import os
+import socket
+import threading
+
+DEFAULT_PROFILE_PATH = os.path.join(os.path.expanduser("~"), ".video_translator",
+                                    "rtf_profile.json")
+
+class ModelSelector:
+    """Pick the most accurate model that transcribes within a time budget,
+    using real-time factors measured on this host"""
+
+    AUTO = "auto"
+    MODELS = ("tiny", "base", "small", "medium", "large")  # Least to most accurate
+    # Seconds of processing per second of audio on a typical CPU, used until
+    # the host has measured its own
+    DEFAULT_RTF = {"tiny": 0.08, "base": 0.15, "small": 0.45, "medium": 1.3, "large": 2.6}
+    QUANTIZED_SPEEDUP = 1.5   # Prior for int8 models without measurements
+    SMOOTHING = 0.3           # Weight of a new measurement in the profile
+    SAFETY_MARGIN = 1.2       # Estimates are padded by this factor
+    MIN_RECORD_SECONDS = 10   # Shorter runs are dominated by overhead
+
+    _lock = threading.Lock()
+
+    def __init__(self, profile_path=DEFAULT_PROFILE_PATH, host=None):
+        self.profile_path = profile_path
+        self.host = host or socket.gethostname()
+
+    @staticmethod
+    def _key(model_size, quantized):
+        # English-only variants decode at the speed of their multilingual model
+        name = model_size[:-3] if model_size.endswith(".en") else model_size
+        return f"{name}:int8" if quantized else name
+
+    def _load(self):
+        try:
+            with open(self.profile_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def profile(self):
+        """Measured real-time factors of this host"""
+        return self._load().get(self.host, {})
+
+    def rtf(self, model_size, quantized=False):
+        """Real-time factor of a model, measured or from the priors"""
+        measured = self.profile().get(self._key(model_size, quantized))
+        if measured:
+            return measured
+        name = self._key(model_size, False)
+        prior = self.DEFAULT_RTF.get(name, self.DEFAULT_RTF["large"])
+        return prior / self.QUANTIZED_SPEEDUP if quantized else prior
+
+    def estimate(self, model_size, duration, quantized=False):
+        """Expected transcription time in seconds"""
+        return duration * self.rtf(model_size, quantized) * self.SAFETY_MARGIN
+
+    def choose(self, duration, budget, quantized=False):
+        """Most accurate model expected to finish within budget seconds,
+        the fastest one when none does"""
+        for model_size in reversed(self.MODELS):
+            if self.estimate(model_size, duration, quantized) <= budget:
+                return model_size
+        return self.MODELS[0]
+
+    def record(self, model_size, audio_seconds, elapsed, quantized=False):
+        """Fold the speed of a completed transcription into the profile"""
+        if audio_seconds < self.MIN_RECORD_SECONDS or elapsed <= 0:
+            return
+        key = self._key(model_size, quantized)
+        measured = elapsed / audio_seconds
+        with ModelSelector._lock:
+            data = self._load()
+            host_profile = data.setdefault(self.host, {})
+            previous = host_profile.get(key)
+            host_profile[key] = (measured if previous is None else
+                                 previous + self.SMOOTHING * (measured - previous))
+            directory = os.path.dirname(self.profile_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            partial = f"{self.profile_path}.{os.getpid()}.tmp"
+            with open(partial, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2, sort_keys=True)
+            os.replace(partial, self.profile_path)
+
+    def describe(self, duration, quantized=False):
+        """Estimated time per model for a duration"""
+        return ", ".join(f"{model_size} ~{self.estimate(model_size, duration, quantized):.0f}s"
+                         for model_size in self.MODELS)
@@ -0,0 +1,628 @@
+"""
+Headless processing pipeline for the Video Translator application
+"""
+
+import json
+import os
+import queue
+import threading
+from contextlib import nullcontext
+
+from cancellation import CancellationToken
+from fingerprint import AudioFingerprinter, FingerprintIndex
+from media_info import MediaInfo
+from model_selector import ModelSelector, DEFAULT_PROFILE_PATH
+from translation_memory import TranslationMemory
+from video_processor import VideoProcessor
+from translator import TranslatorEngine
+from subtitle_creator import SubtitleCreator, SubtitleWriter
+from utils import FileUtils, TimeUtils
+from workspace import Workspace
+
+class VideoPipeline:
+    """Run extraction, transcription, translation and subtitle stages for a video"""
+
+    BATCH_MAX_DURATION = 600  # Longer files would monopolize a shared batch
+    PREVIEW_SECONDS = 60      # Preview length when no end time is given
+    STREAM_BATCH_CHARS = 1000 # Translate streamed segments in batches of this size
+    STREAM_BATCH_WAIT = 2.0   # Seconds to wait for more segments before translating
+    ENGLISH_ONLY_MODELS = ("tiny", "base", "small", "medium")
+    MIN_LANGUAGE_PROBABILITY = 0.5
+
+    DEFAULT_SETTINGS = {
+        "model_size": "small",       # Whisper model or "auto"
+        "dest_lang": "ar",
+        "create_video": True,
+        "subtitle_style": "burned",  # "burned" or "separate"
+        "sync_method": "smart",      # "basic", "delayed" or "smart"
+        "delay": 2.0,
+        "reading_speed": 0.8,
+        "output_dir": "",            # Empty means current directory
+        "streaming": False,          # Decode audio in windows for long recordings
+        "fingerprint_index": "",     # Database of known audio, empty disables reuse
+        "translation_memory": "",    # Database of past translations, empty disables it
+        "memory_threshold": 0.85,    # Similarity needed to reuse a stored translation
+        "start_time": None,          # Only process this range, seconds or [HH:]MM:SS
+        "end_time": None,
+        "preview": False,            # Fast low-resolution burn of the range
+        "workspace_dir": "",         # Disk scratch location when RAM is too small
+        "language": None,            # Spoken language, None detects it
+        "detect_language": True,     # Detect it up front to specialise later stages
+        "quantized": False,          # Int8 Whisper inference on CPU
+        "word_timing": False,        # Build cues from Whisper word timestamps
+        "time_budget": None,         # Transcription time for "auto", None means the audio length
+        "rtf_profile": DEFAULT_PROFILE_PATH,  # Measured model speeds, empty disables learning
+        "stage_timeouts": None,      # Seconds per stage, e.g. {"transcribe": 3600}
+    }
+
+    def __init__(self, translator=None, progress_callback=None, log_callback=None,
+                 batch_transcriber=None, scheduler=None, cancel_token=None):
+        self.translator = translator or TranslatorEngine()
+        self.cancel_token = cancel_token or CancellationToken()
+        self.batch_transcriber = batch_transcriber
+        self.scheduler = scheduler
+        self.progress_callback = progress_callback
+        self.log_callback = log_callback
+
+    @staticmethod
+    def build_settings(overrides=None):
+        """Merge user settings with the defaults"""
+        settings = dict(VideoPipeline.DEFAULT_SETTINGS)
+        if overrides:
+            settings.update(overrides)
+        return settings
+
+    @staticmethod
+    def output_paths(video_path, settings):
+        """Get the paths of the files a run with these settings creates"""
+        settings = VideoPipeline.build_settings(settings)
+        base_name = FileUtils.get_base_name(video_path) + VideoPipeline._range_suffix(settings)
+        dest_lang = settings["dest_lang"]
+        output_dir = settings["output_dir"]
+
+        paths = {
+            "transcript": os.path.join(output_dir, f"{base_name}_transcript.txt"),
+            "translation": os.path.join(output_dir, f"{base_name}_translation_{dest_lang}.txt"),
+        }
+        if settings["streaming"]:
+            paths["segments"] = os.path.join(output_dir, f"{base_name}_segments.jsonl")
+        if settings["create_video"]:
+            paths["srt"] = os.path.join(output_dir, f"{base_name}_translation_{dest_lang}.srt")
+            if settings["subtitle_style"] == "burned":
+                paths["video"] = os.path.join(output_dir,
+                                              f"{base_name}_with_subtitles_{dest_lang}.mp4")
+        return paths
+
+    @staticmethod
+    def time_range(settings, duration=None):
+        """Get (start, end) in seconds, None meaning the start or end of the file"""
+        start = TimeUtils.parse_time(settings["start_time"])
+        end = TimeUtils.parse_time(settings["end_time"])
+        if settings["preview"] and end is None:
+            end = (start or 0.0) + VideoPipeline.PREVIEW_SECONDS
+        if duration and start is not None and start >= duration:
+            raise Exception(f"Start time ({start:.1f}s) must be before the end of the video "
+                            f"({duration:.1f}s)")
+        if duration and end is not None and end >= duration:
+            end = None
+        if start is not None and end is not None and end <= start:
+            raise Exception(f"End time ({end:.1f}s) must be after start time ({start:.1f}s)")
+        return start, end
+
+    @staticmethod
+    def _range_suffix(settings):
+        """Name suffix keeping range and preview outputs apart from full runs"""
+        if settings["preview"]:
+            return "_preview"
+        start, end = VideoPipeline.time_range(settings)
+        if start is None and end is None:
+            return ""
+        return f"_{int(start or 0)}-{int(end) if end is not None else 'end'}s"
+
+    def _stage(self, stage, cancel_token=None):
+        """Enter a stage within the scheduler's CPU budget, yields its thread count"""
+        if self.scheduler:
+            return self.scheduler.stage(stage, cancel_token or self.cancel_token)
+        return nullcontext()
+
+    def _timeout(self, stage, settings):
+        """Token for one stage, cancelled with the job or when the stage's timeout passes"""
+        timeout = (settings["stage_timeouts"] or {}).get(stage)
+        return self.cancel_token.child(timeout, f"{stage.capitalize()} stage timed out "
+                                                f"after {timeout}s")
+
+    def _log(self, msg):
+        if self.log_callback:
+            self.log_callback(msg)
+
+    def _progress(self, value, status=""):
+        if self.progress_callback:
+            self.progress_callback(value, status)
+
+    def process(self, video_path, settings=None,
+                transcript_callback=None, translation_callback=None):
+        """Process a video and return the created files, raises CancelledError
+        when cancel_token is cancelled or a stage times out"""
+        self.cancel_token.raise_if_cancelled()
+        settings = self.build_settings(settings)
+        paths = self.output_paths(video_path, settings)
+        if settings["output_dir"]:
+            os.makedirs(settings["output_dir"], exist_ok=True)
+
+        self._log("Starting video processing...")
+        self._log(f"File: {os.path.basename(video_path)}")
+        self._log(f"Size: {FileUtils.get_file_size(video_path):.1f} MB")
+
+        info, start, end, duration = self.probe(video_path, settings)
+        self.resolve_model(video_path, settings, info, duration, start)
+
+        # Intermediates live in a private scratch directory, outputs are
+        # only moved into place once they are complete
+        with Workspace(FileUtils.get_base_name(video_path),
+                       self._workspace_size_mb(video_path, duration, info, settings),
+                       disk_dir=settings["workspace_dir"] or None) as workspace:
+            self._log(f"Workspace: {workspace.path}"
+                      f"{' (in memory)' if workspace.in_memory else ''}")
+            work = self.work_paths(workspace, paths)
+            produced = self._run_stages(video_path, settings, info, duration, start, end,
+                                        work, workspace.file("audio.wav"),
+                                        transcript_callback, translation_callback)
+
+            created = self.publish(workspace, paths, produced["keys"])
+            self._log("Cleaning temporary files...")
+
+        return {"transcript": produced["transcript"], "translated": produced["translated"],
+                "files": created}
+
+    @staticmethod
+    def work_paths(workspace, paths):
+        """Scratch paths in the workspace for the given output paths"""
+        return {key: workspace.file(os.path.basename(path)) for key, path in paths.items()}
+
+    @staticmethod
+    def publish(workspace, paths, keys):
+        """Move the finished files of the given keys to their output paths"""
+        return [workspace.publish(os.path.basename(paths[key]), paths[key]) for key in keys]
+
+    def probe(self, video_path, settings):
+        """Check the video and resolve the range, returns (info, start, end, duration)"""
+        info = MediaInfo.probe(video_path)
+        self._log(f"Media: {info.describe()}")
+        if not info.has_audio:
+            raise Exception("No audio stream found in the video")
+
+        start, end = self.time_range(settings, info.duration)
+        duration = (end if end is not None else info.duration) - (start or 0.0)
+        if start is not None or end is not None:
+            self._log(f"Processing range {TimeUtils.format_timestamp(start or 0.0)} - "
+                      f"{TimeUtils.format_timestamp((start or 0.0) + duration)}"
+                      f"{' (preview)' if settings['preview'] else ''}")
+        return info, start, end, duration
+
+    def resolve_model(self, video_path, settings, info, duration, start=None):
+        """Fix the model and spoken language in settings before transcribing"""
+        self._choose_model(settings, duration)
+        self._detect_language(video_path, settings, info, start)
+
+    def extract(self, video_path, audio_path, settings, info, duration, start=None, end=None):
+        """Extract the audio range to audio_path, returns the audio file to transcribe"""
+        if info.is_whisper_ready() and start is None and end is None:
+            self._log("✓ Audio is already 16 kHz mono PCM, skipping extraction")
+            return video_path
+
+        self._progress(10, "Extracting audio...")
+        self._log("Extracting audio from video...")
+        with self._stage("extract") as threads, self._timeout("extract", settings) as token:
+            VideoProcessor.extract_audio(video_path, audio_path,
+                                         progress_callback=self.progress_callback,
+                                         audio_stream=info.audio_stream_index,
+                                         duration=duration, start=start, end=end,
+                                         threads=threads, cancel_token=token)
+        self._log("✓ Audio extracted successfully")
+        return audio_path
+
+    def transcribe(self, audio_path, video_path, settings, duration, start=None):
+        """Transcribe the audio, unless it was already transcribed. Returns
+        (transcript, segments on the video's timeline, spoken language)"""
+        result = self._transcribe(audio_path, video_path, settings["model_size"],
+                                  settings, duration)
+        transcript = result.get("text", "").strip()
+        segments = result.get("segments", [])
+        if start:
+            # Whisper timestamps are relative to the extracted range
+            segments = [self._shift_segment(segment, start) for segment in segments]
+
+        self._log(f"✓ Audio converted to text ({len(transcript)} characters)")
+        self._log(f"✓ {len(segments)} time segments identified")
+
+        if segments:
+            total_duration = segments[-1]['end'] - segments[0]['start']
+            self._log(f"✓ Video duration: {total_duration:.1f} seconds")
+
+        return transcript, segments, result.get("language") or settings["language"]
+
+    def translate(self, transcript, segments, source_lang, settings):
+        """Translate the transcript, returns the translation and the per-segment
+        translations, None when translated as a whole"""
+        if not self._needs_translation(settings):
+            return transcript, [segment["text"] for segment in segments]
+
+        dest_lang = settings["dest_lang"]
+        self._progress(70, f"Translating to {dest_lang}...")
+        self._log(f"Translating text to {dest_lang} language...")
+        with self._stage("translate") as concurrency, \
+             self._timeout("translate", settings) as token:
+            return self._translate(transcript, segments, source_lang, settings,
+                                   concurrency, token)
+
+    def write_outputs(self, transcript, translated, segments, translated_segments,
+                      settings, work):
+        """Write the text files and the SRT file to the work paths, returns their keys"""
+        self._progress(90, "Saving text files...")
+        with open(work["transcript"], "w", encoding="utf-8") as f:
+            f.write(transcript)
+        with open(work["translation"], "w", encoding="utf-8") as f:
+            f.write(translated)
+        self._log(f"✓ Original text saved to: {os.path.basename(work['transcript'])}")
+        self._log(f"✓ Translation saved to: {os.path.basename(work['translation'])}")
+        keys = ["transcript", "translation"]
+
+        if settings["create_video"]:
+            self._log("-" * 40)
+            self._log("Creating subtitle and video files...")
+            self._create_subtitles(segments, translated, work["srt"], settings,
+                                   translated_segments)
+            self._log(f"✓ Subtitle file created: {os.path.basename(work['srt'])}")
+            keys.append("srt")
+        return keys
+
+    def burn(self, video_path, srt_path, output_path, settings, info, duration,
+             start=None, end=None):
+        """Burn the subtitles onto the video range"""
+        self._log("Burning subtitles to video...")
+        with self._stage("burn") as threads, self._timeout("burn", settings) as token:
+            VideoProcessor.burn_subtitles(video_path, srt_path, output_path,
+                                          self.progress_callback,
+                                          audio_stream=info.audio_stream_index,
+                                          duration=duration, start=start, end=end,
+                                          preview=settings["preview"],
+                                          threads=threads, cancel_token=token)
+        self._log(f"✓ Video with subtitles created: {os.path.basename(output_path)}")
+
+    def _choose_model(self, settings, duration):
+        """Resolve the "auto" model from the time budget and this host's speed profile"""
+        if settings["model_size"] != ModelSelector.AUTO:
+            return
+        budget = TimeUtils.parse_time(settings["time_budget"]) or duration
+        selector = ModelSelector(settings["rtf_profile"])
+        settings["model_size"] = selector.choose(duration, budget, settings["quantized"])
+        self._log(f"Estimated transcription time: {selector.describe(duration, settings['quantized'])}")
+        self._log(f"✓ Selected model {settings['model_size']} for a {budget:.0f}s budget")
+
+    def _record_speed(self, model_size, settings, audio_seconds, elapsed):
+        """Update the speed profile used by the "auto" model. Word timestamps add
+        an alignment pass the estimates do not cover, so those runs are skipped."""
+        if not settings["rtf_profile"] or settings["word_timing"]:
+            return
+        try:
+            ModelSelector(settings["rtf_profile"]).record(model_size, audio_seconds, elapsed,
+                                                          settings["quantized"])
+        except OSError as e:
+            self._log(f"⚠ Could not update the model speed profile: {e}")
+
+    def _detect_language(self, video_path, settings, info, start):
+        """Fix the language and model for the main decode from a 30-second pre-pass"""
+        if settings["language"] or not settings["detect_language"]:
+            return
+
+        self._progress(5, "Detecting language...")
+        language, probability = VideoProcessor.detect_language(
+            video_path, settings["model_size"], info.audio_stream_index, start,
+            quantized=settings["quantized"], cancel_token=self.cancel_token)
+        if not language or probability < self.MIN_LANGUAGE_PROBABILITY:
+            self._log("⚠ Spoken language is unclear, detecting it while transcribing")
+            return
+
+        self._log(f"✓ Detected language: {language} ({probability:.0%})")
+        settings["language"] = language
+        if language == "en" and settings["model_size"] in self.ENGLISH_ONLY_MODELS:
+            settings["model_size"] += ".en"
+            self._log(f"✓ Using English-only model {settings['model_size']}")
+        if self._needs_translation(settings):
+            return
+        self._log(f"✓ Audio is already in {settings['dest_lang']}, translation will be skipped")
+
+    @staticmethod
+    def _needs_translation(settings):
+        """Translation can be skipped when the audio is in the target language"""
+        language = settings["language"]
+        # Whisper uses "zh" where the translator uses "zh-cn"
+        return not language or language.lower() != settings["dest_lang"].lower().split("-")[0]
+
+    @staticmethod
+    def _workspace_size_mb(video_path, duration, info, settings):
+        """Rough size of the job's intermediates"""
+        size_mb = duration * 32000 / (1024 * 1024)  # 16 kHz 16-bit mono WAV
+        if settings["create_video"] and settings["subtitle_style"] == "burned":
+            # The burned video is about as large as the covered part of the input
+            share = duration / info.duration if info.duration else 1.0
+            size_mb += FileUtils.get_file_size(video_path) * share
+        return size_mb
+
+    def _run_stages(self, video_path, settings, info, duration, start, end, work, audio_path,
+                    transcript_callback, translation_callback):
+        """Run the stages, writing into the workspace paths"""
+        produced = {"transcript": "", "translated": "", "keys": []}
+
+        model_size = settings["model_size"]
+        if settings["streaming"]:
+            # 1-5) Translate and write subtitles while Whisper is still decoding
+            self._progress(30, f"Loading model ({model_size})...")
+            self._log(f"Streaming audio to {model_size} model, translating as it goes...")
+            if settings["word_timing"]:
+                self._log("⚠ Word timing is not available for streaming, using segment timing")
+            transcript, translated = self._process_streaming(video_path, settings, work,
+                                                             info, duration, start, end)
+            produced["keys"].extend(key for key in work if key != "video")
+            self._log(f"✓ Audio converted to text ({len(transcript)} characters)")
+        else:
+            audio_path = self.extract(video_path, audio_path, settings, info, duration,
+                                      start, end)
+            transcript, segments, source_lang = self.transcribe(audio_path, video_path,
+                                                                settings, duration, start)
+
+        if transcript_callback:
+            transcript_callback(transcript)
+
+        if not transcript:
+            self._progress(100, "No text found")
+            self._log("⚠ No text found for translation")
+            return produced
+
+        translated_segments = None
+        if not settings["streaming"]:
+            translated, translated_segments = self.translate(transcript, segments,
+                                                             source_lang, settings)
+
+        self._log("✓ Translation completed successfully")
+        self._log(f"✓ Translated text length: {len(translated)} characters")
+        produced["transcript"] = transcript
+        produced["translated"] = translated
+
+        if translation_callback:
+            translation_callback(translated)
+
+        if settings["streaming"]:
+            self._log(f"✓ Original text saved to: {os.path.basename(work['transcript'])}")
+            self._log(f"✓ Translation saved to: {os.path.basename(work['translation'])}")
+            if settings["create_video"]:
+                self._log("-" * 40)
+                self._log(f"✓ Subtitle file created: {os.path.basename(work['srt'])}")
+        else:
+            produced["keys"].extend(self.write_outputs(transcript, translated, segments,
+                                                       translated_segments, settings, work))
+
+        if settings["create_video"] and settings["subtitle_style"] == "burned":
+            if not info.video_streams:
+                self._log("⚠ No video stream to burn subtitles onto, skipping")
+            else:
+                self.burn(video_path, work["srt"], work["video"], settings, info, duration,
+                          start, end)
+                produced["keys"].append("video")
+
+        return produced
+
+    @staticmethod
+    def _shift_segment(segment, offset):
+        """Move a segment and its words by offset seconds"""
+        shifted = dict(segment, start=segment["start"] + offset, end=segment["end"] + offset)
+        if "words" in segment:
+            shifted["words"] = [dict(word, start=word["start"] + offset,
+                                     end=word["end"] + offset) for word in segment["words"]]
+        return shifted
+
+    def _transcribe(self, audio_path, video_path, model_size, settings, duration):
+        """Transcribe extracted audio, reusing the transcript of known duplicates"""
+        index = None
+        if settings["fingerprint_index"]:
+            index = FingerprintIndex(settings["fingerprint_index"])
+            hashes, audio_duration = AudioFingerprinter.fingerprint_file(audio_path)
+            match = index.find(hashes, audio_duration)
+            if match:
+                self._log(f"✓ Audio matches {os.path.basename(match['source'])} "
+                          f"(offset {match['offset']:.2f}s), reusing its transcript")
+                self._progress(70, "Reused existing transcript")
+                return match
+
+        # An English-only model picked after language detection shares the batch of
+        # its multilingual model, which decodes in the detected language
+        base_model = model_size[:-3] if model_size.endswith(".en") else model_size
+        if (self.batch_transcriber
+                and self.batch_transcriber.model_size in (model_size, base_model)
+                and self.batch_transcriber.quantized == settings["quantized"]
+                and not settings["word_timing"]
+                and duration <= self.BATCH_MAX_DURATION):
+            self._log(f"Queueing audio for batched {self.batch_transcriber.model_size} "
+                      f"transcription...")
+            with self._timeout("transcribe", settings) as token:
+                future = self.batch_transcriber.submit(audio_path, token,
+                                                       language=settings["language"])
+                while not future.done():
+                    if token.wait(0.5):
+                        token.raise_if_cancelled()
+                result = future.result()
+        else:
+            with self._stage("transcribe") as threads, \
+                 self._timeout("transcribe", settings) as token:
+                self._progress(30, f"Loading model ({model_size})...")
+                self._log(f"Converting audio to text using {model_size} model...")
+                result = VideoProcessor.transcribe_with_whisper(audio_path, model_size,
+                                                                progress_callback=self.progress_callback,
+                                                                threads=threads,
+                                                                language=settings["language"],
+                                                                quantized=settings["quantized"],
+                                                                word_timestamps=settings["word_timing"],
+                                                                cancel_token=token)
+                self._record_speed(model_size, settings, duration,
+                                   result.get("decode_seconds", 0.0))
+        if index:
+            index.add(video_path, hashes, audio_duration, result)
+        return result
+
+    def _translate(self, transcript, segments, source_lang, settings, concurrency=None,
+                   cancel_token=None):
+        """Translate the transcript, segment by segment when a memory is used or
+        cues are word-timed. Returns the text and the per-segment translations,
+        None when translated as a whole."""
+        dest_lang = settings["dest_lang"]
+        if not settings["translation_memory"] and not settings["word_timing"]:
+            return self.translator.translate_text(transcript, dest_lang,
+                                                  progress_callback=self.progress_callback,
+                                                  cancel_token=cancel_token), None
+
+        memory = None
+        if settings["translation_memory"]:
+            memory = TranslationMemory(settings["translation_memory"],
+                                       settings["memory_threshold"])
+        try:
+            translated_segments = self.translator.translate_segments(
+                [segment["text"] for segment in segments], dest_lang, source_lang,
+                memory=memory, progress_callback=self.progress_callback,
+                concurrency=concurrency or 1, cancel_token=cancel_token)
+        finally:
+            if memory:
+                memory.close()
+        return " ".join(text for text in translated_segments if text), translated_segments
+
+    def _process_streaming(self, video_path, settings, work, info, duration, start, end):
+        """Overlap the stages: Whisper feeds a queue, batches are translated and
+        appended to the output files while the next windows are decoded"""
+        segment_queue = queue.Queue()
+        # Cancelled when the consumer stops early, so Whisper and ffmpeg stop too
+        transcribe_token = self._timeout("transcribe", settings)
+        errors = []
+
+        def produce():
+            try:
+                with self._stage("transcribe", transcribe_token) as threads:
+                    stats = {}
+                    for segment in VideoProcessor.stream_transcribe(
+                            video_path, settings["model_size"], language=settings["language"],
+                            progress_callback=self.progress_callback,
+                            audio_stream=info.audio_stream_index, duration=duration,
+                            start=start, end=end, threads=threads,
+                            quantized=settings["quantized"], cancel_token=transcribe_token,
+                            stats=stats):
+                        segment_queue.put(segment)
+                    self._record_speed(settings["model_size"], settings, duration,
+                                       stats.get("decode_seconds", 0.0))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                segment_queue.put(None)
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+
+        memory = None
+        if settings["translation_memory"]:
+            memory = TranslationMemory(settings["translation_memory"], settings["memory_threshold"])
+        writer = None
+        if settings["create_video"]:
+            writer = SubtitleWriter(work["srt"], settings["sync_method"], settings["delay"],
+                                    settings["reading_speed"])
+
+        texts = []
+        translations = []
+        try:
+            with open(work["transcript"], "w", encoding="utf-8") as transcript_file, \
+                 open(work["segments"], "w", encoding="utf-8") as segments_file, \
+                 open(work["translation"], "w", encoding="utf-8") as translation_file, \
+                 self._stage("translate") as concurrency, \
+                 self._timeout("translate", settings) as token:
+                for batch in self._segment_batches(segment_queue):
+                    if self._needs_translation(settings):
+                        translated = self.translator.translate_segments(
+                            [segment["text"] for segment in batch], settings["dest_lang"],
+                            settings["language"], memory=memory, concurrency=concurrency or 1,
+                            cancel_token=token)
+                    else:
+                        translated = [segment["text"] for segment in batch]
+                    for segment, text in zip(batch, translated):
+                        segments_file.write(json.dumps(segment, ensure_ascii=False) + "\n")
+                        transcript_file.write(segment["text"] + "\n")
+                        translation_file.write(text + "\n")
+                        if writer:
+                            writer.add(segment, text)
+                        texts.append(segment["text"])
+                        translations.append(text)
+                    for output in (segments_file, transcript_file, translation_file):
+                        output.flush()
+                    self._log(f"✓ {len(texts)} segments transcribed and translated")
+        finally:
+            transcribe_token.cancel("Transcription stopped")
+            producer.join()
+            transcribe_token.close()
+            if writer:
+                writer.close()
+            if memory:
+                memory.close()
+
+        if errors:
+            raise errors[0]
+        self._progress(90, "Transcription and translation complete")
+        return " ".join(texts), " ".join(text for text in translations if text)
+
+    def _segment_batches(self, segment_queue):
+        """Group queued segments, flushing early when Whisper is between windows"""
+        batch = []
+        batch_chars = 0
+        while True:
+            try:
+                segment = segment_queue.get(timeout=self.STREAM_BATCH_WAIT if batch else None)
+            except queue.Empty:
+                yield batch
+                batch, batch_chars = [], 0
+                continue
+            if segment is None:
+                break
+            batch.append(segment)
+            batch_chars += len(segment["text"])
+            if batch_chars >= self.STREAM_BATCH_CHARS:
+                yield batch
+                batch, batch_chars = [], 0
+        if batch:
+            yield batch
+
+    def _create_subtitles(self, segments, translated, srt_file, settings,
+                          translated_segments=None):
+        """Create the SRT file with the selected sync method"""
+        sync_method = settings["sync_method"]
+        delay_amount = settings["delay"]
+
+        if settings["word_timing"] and SubtitleCreator.has_word_timestamps(segments):
+            self._log("Using word timestamps to split cues...")
+            SubtitleCreator.create_word_timed_srt(segments, translated_segments or translated,
+                                                  srt_file,
+                                                  reading_speed=settings["reading_speed"],
+                                                  progress_callback=self.progress_callback)
+            return
+        if settings["word_timing"]:
+            self._log("⚠ No word timestamps available, using segment timing")
+
+        if sync_method == "basic":
+            self._log("Using basic method (no delay)...")
+            SubtitleCreator.create_basic_srt(segments, translated, srt_file,
+                                             progress_callback=self.progress_callback)
+        elif sync_method == "delayed":
+            self._log(f"Using delay method ({delay_amount} seconds)...")
+            SubtitleCreator.create_delayed_srt(segments, translated, srt_file,
+                                               delay_seconds=delay_amount,
+                                               progress_callback=self.progress_callback)
+        else:  # smart
+            speed_factor = settings["reading_speed"]
+            self._log(f"Using smart sync (delay: {delay_amount}s, speed: {speed_factor})...")
+            SubtitleCreator.create_smart_srt(segments, translated, srt_file,
+                                             sync_adjustment=delay_amount,
+                                             reading_speed=speed_factor,
+                                             progress_callback=self.progress_callback)
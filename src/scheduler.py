@@ -0,0 +1,81 @@
+"""
+CPU scheduling for the Video Translator application
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+
+class ResourceScheduler:
+    """Share the host's cores between the stages of concurrent jobs"""
+
+    STAGES = ("extract", "transcribe", "translate", "burn")
+
+    def __init__(self, max_cpus=None, transcribe_threads=None, ffmpeg_threads=None,
+                 translate_concurrency=4, max_transcribe_jobs=1):
+        """
+        max_cpus: cores this process may keep busy (default: all usable cores).
+        transcribe_threads: torch intra-op threads per transcription.
+        ffmpeg_threads: -threads for subtitle burning.
+        translate_concurrency: parallel translation requests per job, these wait
+        on the network and don't take cores from the budget.
+        max_transcribe_jobs: concurrent transcriptions, torch threads are process-wide.
+        """
+        self.max_cpus = max_cpus or self.available_cpus()
+        self.transcribe_threads = min(self.max_cpus,
+                                      transcribe_threads or max(1, self.max_cpus * 2 // 3))
+        self.ffmpeg_threads = min(self.max_cpus,
+                                  ffmpeg_threads or max(1, self.max_cpus - self.transcribe_threads))
+        self.translate_concurrency = translate_concurrency
+
+        self._costs = {
+            "extract": 1,  # Audio decoding is essentially single threaded
+            "transcribe": self.transcribe_threads,
+            "translate": 0,
+            "burn": self.ffmpeg_threads,
+        }
+        self._limits = {"transcribe": max_transcribe_jobs}
+        self._running = {stage: 0 for stage in self.STAGES}
+        self._free = self.max_cpus
+        self._condition = threading.Condition()
+
+    @staticmethod
+    def available_cpus():
+        """Cores this process is allowed to run on"""
+        try:
+            return len(os.sched_getaffinity(0))
+        except AttributeError:
+            return os.cpu_count() or 1
+
+    def threads_for(self, stage):
+        """Threads a stage is allowed to use"""
+        if stage == "translate":
+            return self.translate_concurrency
+        return self._costs[stage]
+
+    @contextmanager
+    def stage(self, stage, cancel_token=None):
+        """Wait until the stage fits in the budget, yields its thread count.
+        A cancelled job stops waiting and raises CancelledError."""
+        cost = self._costs[stage]
+        limit = self._limits.get(stage)
+        with self._condition:
+            while cost > self._free or (limit and self._running[stage] >= limit):
+                if cancel_token:
+                    cancel_token.raise_if_cancelled()
+                self._condition.wait(0.5 if cancel_token else None)
+            self._free -= cost
+            self._running[stage] += 1
+        try:
+            yield self.threads_for(stage)
+        finally:
+            with self._condition:
+                self._free += cost
+                self._running[stage] -= 1
+                self._condition.notify_all()
+
+    def describe(self):
+        """Short summary of the budgets"""
+        return (f"{self.max_cpus} cores: {self.transcribe_threads} Whisper threads, "
+                f"{self.ffmpeg_threads} ffmpeg threads, "
+                f"{self.translate_concurrency} translation requests")
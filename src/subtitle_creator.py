@@ -15,6 +15,14 @@ from utils import TimeUtils
 class SubtitleCreator:
     """Create subtitle files in different formats"""
     
+    # Limits for cues built from word timestamps
+    CUE_MAX_CHARS = 42
+    CUE_MAX_DURATION = 6.0
+    CUE_PAUSE = 0.6           # A silence this long starts a new cue
+    CUE_SNAP_CHARS = 20       # How far a translation cut may move to reach a space
+    SENTENCE_ENDS = (".", "!", "?", "؟", "。", "！", "？")
+    CLAUSE_ENDS = (",", ";", ":", "،", "，")
+    
     @staticmethod
     def create_basic_srt(segments, translated_text, output_path, progress_callback=None):
         """Create basic SRT file using Whisper timings"""
@@ -183,6 +191,157 @@ class SubtitleCreator:
         except Exception as e:
             raise Exception(f"Error in smart synchronization: {e}")
     
+    @staticmethod
+    def create_word_timed_srt(segments, translated, output_path, reading_speed=0.8,
+                              progress_callback=None):
+        """Create SRT cues from word timestamps, translated is a list with the
+        translation of each segment or one text for the whole transcript"""
+        try:
+            if progress_callback:
+                progress_callback(92, "Creating word-timed subtitles...")
+            
+            cues = SubtitleCreator._build_word_cues(segments)
+            texts = SubtitleCreator._map_translation(cues, translated)
+            
+            with open(output_path, 'w', encoding='utf-8') as f:
+                count = 0
+                for i, (cue, text) in enumerate(zip(cues, texts)):
+                    if not text:
+                        continue
+                    # Keep short cues up long enough to read, up to the next one
+                    end = max(cue['end'], cue['start'] + len(text) * 0.15 / reading_speed)
+                    if i < len(cues) - 1:
+                        end = min(end, max(cue['end'], cues[i + 1]['start'] - 0.05))
+                    count += 1
+                    f.write(f"{count}\n")
+                    f.write(f"{TimeUtils.format_timestamp(cue['start'])} --> "
+                            f"{TimeUtils.format_timestamp(end)}\n")
+                    lines = SubtitleCreator._split_long_text(text, line_break="\n")
+                    f.write(f"{lines}\n\n")
+            
+            return output_path
+        except Exception as e:
+            raise Exception(f"Error creating word-timed subtitle file: {e}")
+    
+    @staticmethod
+    def has_word_timestamps(segments):
+        """Check that every segment carries Whisper word timestamps"""
+        return bool(segments) and all("words" in segment for segment in segments)
+    
+    @staticmethod
+    def _build_word_cues(segments, max_chars=CUE_MAX_CHARS, max_duration=CUE_MAX_DURATION,
+                         pause=CUE_PAUSE):
+        """Group words into cues in a single pass. A cue closes after sentence
+        punctuation, after a clause once it is half full, or before a pause or a
+        word that would exceed the length or duration limit. Each cue records
+        where it ends in the source text, per segment and overall."""
+        cues = []
+        segment_chars = [sum(len(word['word']) for word in segment['words'])
+                         for segment in segments]
+        total_chars = sum(segment_chars)
+        cue = None
+        segment_idx = 0
+        position = 0   # Characters of the current segment up to the current word
+        offset = 0     # Characters of the whole transcript up to the current word
+        
+        def close(cue_segment, punctuated=False):
+            # A cue closed on the next segment's first word ends with its own segment
+            end = position if cue_segment == segment_idx else segment_chars[cue_segment]
+            cue.update(segment=cue_segment, position=end, offset=offset,
+                       punctuated=punctuated,
+                       segment_chars=segment_chars[cue_segment], total_chars=total_chars)
+            cues.append(cue)
+        
+        for segment_idx, segment in enumerate(segments):
+            position = 0
+            for word in segment['words']:
+                text = word['word']
+                if cue and (cue['length'] + len(text) > max_chars
+                            or word['end'] - cue['start'] > max_duration
+                            or word['start'] - cue['end'] >= pause):
+                    close(cue['last_segment'])
+                    cue = None
+                if cue is None:
+                    cue = {'start': word['start'], 'end': word['end'], 'length': 0}
+                cue['end'] = max(cue['end'], word['end'])
+                cue['length'] += len(text)
+                cue['last_segment'] = segment_idx
+                position += len(text)
+                offset += len(text)
+                
+                stripped = text.strip()
+                if (stripped.endswith(SubtitleCreator.SENTENCE_ENDS)
+                        or (stripped.endswith(SubtitleCreator.CLAUSE_ENDS)
+                            and cue['length'] >= max_chars // 2)):
+                    close(segment_idx, punctuated=True)
+                    cue = None
+        if cue:
+            close(cue['last_segment'])
+        return cues
+    
+    @staticmethod
+    def _map_translation(cues, translated, snap_chars=CUE_SNAP_CHARS):
+        """Cut the translation at the relative positions where the cues end in the
+        source. With per-segment translations every segment is an anchor, so a
+        difference in length never carries over into the next segment."""
+        if isinstance(translated, str):
+            parts = [translated.strip()]
+            anchors = [(0, cue['offset'], cue['total_chars']) for cue in cues]
+        else:
+            parts = [text.strip() for text in translated]
+            anchors = [(cue['segment'], cue['position'], cue['segment_chars']) for cue in cues]
+        
+        starts = []
+        pos = 0
+        for part in parts:
+            starts.append(pos)
+            pos += len(part) + 1
+        stream = " ".join(parts)
+        
+        texts = []
+        previous = 0
+        for cue, (part_idx, position, chars) in zip(cues, anchors):
+            if part_idx >= len(parts):
+                target = upper = len(stream)
+            else:
+                share = position / chars if chars else 1.0
+                target = starts[part_idx] + round(len(parts[part_idx]) * share)
+                # Snapping never reaches into the next segment's translation
+                upper = starts[part_idx] + len(parts[part_idx])
+            target = max(target, previous)
+            cut = None
+            if cue['punctuated']:
+                # Prefer the matching punctuation in the translation
+                cut = SubtitleCreator._snap_to_space(stream, target, previous, snap_chars,
+                                                     after_punctuation=True, upper=upper)
+            if cut is None:
+                cut = SubtitleCreator._snap_to_space(stream, target, previous, snap_chars,
+                                                     upper=upper)
+            texts.append(stream[previous:cut].strip())
+            previous = cut
+        if texts and previous < len(stream):
+            texts[-1] = f"{texts[-1]} {stream[previous:].strip()}".strip()
+        return texts
+    
+    @staticmethod
+    def _snap_to_space(text, position, lower, limit, after_punctuation=False, upper=None):
+        """Nearest boundary within limit characters and between lower and upper:
+        a space, or a position after punctuation for languages without spaces.
+        Without one this is the position itself, or None when after_punctuation
+        asks for punctuation."""
+        if position >= len(text):
+            return len(text)
+        upper = len(text) - 1 if upper is None else min(upper, len(text) - 1)
+        punctuation = SubtitleCreator.SENTENCE_ENDS + SubtitleCreator.CLAUSE_ENDS
+        for distance in range(limit + 1):
+            for candidate in (position + distance, position - distance):
+                if not lower < candidate <= upper:
+                    continue
+                after_mark = text[candidate - 1] in punctuation
+                if after_mark or (text[candidate] == " " and not after_punctuation):
+                    return candidate
+        return None if after_punctuation else position
+    
     @staticmethod
     def _split_text_smartly(text, max_length=40):
         """Split text into sentences considering length"""
@@ -228,8 +387,8 @@ class SubtitleCreator:
         return {'start': display_start, 'end': display_end}
     
     @staticmethod
-    def _split_long_text(text, max_line_length=35):
-        """Split long text into two lines"""
+    def _split_long_text(text, max_line_length=35, line_break="\\n"):
+        """Split long text into two lines, joined by line_break"""
         if len(text) <= max_line_length:
             return text
         
@@ -240,4 +399,56 @@ class SubtitleCreator:
         mid_point = len(words) // 2
         line1 = " ".join(words[:mid_point])
         line2 = " ".join(words[mid_point:])
-        return f"{line1}\\n{line2}"
\ No newline at end of file
+        return f"{line1}{line_break}{line2}"
+
+class SubtitleWriter:
+    """Append cues to an SRT file while segments are still being produced"""
+    
+    def __init__(self, output_path, sync_method="smart", delay_seconds=2.0, 
+                 reading_speed=0.8):
+        self.output_path = output_path
+        self.sync_method = sync_method
+        self.delay_seconds = delay_seconds
+        self.reading_speed = reading_speed
+        self.count = 0
+        self._pending = None  # Smart timing needs the next segment's start
+        self._file = open(output_path, "w", encoding="utf-8")
+    
+    def add(self, segment, text):
+        """Queue a translated segment, writing the previous one"""
+        if self._pending:
+            self._write(*self._pending, next_segment=segment)
+        self._pending = (segment, text.strip())
+    
+    def close(self):
+        """Write the last cue and close the file"""
+        if self._pending:
+            self._write(*self._pending, next_segment=None)
+            self._pending = None
+        self._file.close()
+    
+    def _write(self, segment, text, next_segment):
+        if not text:
+            return
+        
+        if self.sync_method == "basic":
+            start, end = segment['start'], segment['end']
+        elif self.sync_method == "delayed":
+            start = segment['start'] + self.delay_seconds
+            end = segment['end'] + self.delay_seconds
+            min_duration = max(3.0, len(text) * 0.15)
+            if end - start < min_duration:
+                end = start + min_duration
+        else:  # smart
+            neighbours = [segment, next_segment] if next_segment else [segment]
+            timing = SubtitleCreator._calculate_subtitle_timing(
+                segment, text, self.delay_seconds, self.reading_speed, 0, neighbours)
+            start, end = timing['start'], max(timing['end'], timing['start'] + 0.5)
+            text = SubtitleCreator._split_long_text(text, line_break="\n")
+        
+        self.count += 1
+        self._file.write(f"{self.count}\n")
+        self._file.write(f"{TimeUtils.format_timestamp(start)} --> "
+                         f"{TimeUtils.format_timestamp(end)}\n")
+        self._file.write(f"{text}\n\n")
+        self._file.flush()
@@ -0,0 +1,174 @@
+"""
+Lease-based stage task queue for the Video Translator application
+"""
+
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing, contextmanager
+
+DEFAULT_QUEUE_DIR = os.path.join(os.path.expanduser("~"), ".video_translator", "queue")
+
+class TaskQueue:
+    """SQLite queue of stage tasks shared by worker processes.
+
+    A worker claims a task with a lease that it renews while working. When a
+    worker dies its lease expires and the task is handed to another worker,
+    until MAX_ATTEMPTS is reached. The database must be on a filesystem with
+    working file locks (a local disk, or a share mounted with locking)."""
+
+    STAGES = ("extract", "transcribe", "translate", "burn")
+    LEASE_SECONDS = 60
+    MAX_ATTEMPTS = 3
+    WORKER_TIMEOUT = 120   # Workers without a heartbeat this long are listed as gone
+
+    def __init__(self, queue_dir=DEFAULT_QUEUE_DIR):
+        self.queue_dir = queue_dir
+        self.db_path = os.path.join(queue_dir, "queue.db")
+        os.makedirs(queue_dir, exist_ok=True)
+        with self._transaction() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS tasks ("
+                         "id INTEGER PRIMARY KEY, job TEXT, stage TEXT, payload TEXT, "
+                         "status TEXT, attempts INTEGER DEFAULT 0, owner TEXT, "
+                         "expires REAL, error TEXT, updated REAL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS tasks_claim ON tasks (status, stage)")
+            conn.execute("CREATE TABLE IF NOT EXISTS workers ("
+                         "name TEXT PRIMARY KEY, stages TEXT, heartbeat REAL)")
+
+    def _connect(self):
+        # Autocommit mode, transactions are opened explicitly
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    @contextmanager
+    def _transaction(self):
+        """Write transaction that holds the database lock from the start, so
+        two workers never read the same free task"""
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def job_dir(self, job):
+        """Directory holding the intermediate files of a job"""
+        return os.path.join(self.queue_dir, "jobs", job)
+
+    def submit(self, job, stage, payload=None):
+        """Queue a stage task, returns its id"""
+        with self._transaction() as conn:
+            return self._insert(conn, job, stage, payload)
+
+    @staticmethod
+    def _insert(conn, job, stage, payload):
+        if stage not in TaskQueue.STAGES:
+            raise Exception(f"Unknown stage: {stage}")
+        cursor = conn.execute("INSERT INTO tasks (job, stage, payload, status, updated) "
+                              "VALUES (?, ?, ?, 'pending', ?)",
+                              (job, stage, json.dumps(payload or {}), time.time()))
+        return cursor.lastrowid
+
+    def register(self, worker, stages):
+        """Advertise a worker and the stages it runs, also serves as heartbeat"""
+        with self._transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO workers (name, stages, heartbeat) "
+                         "VALUES (?, ?, ?)", (worker, ",".join(stages), time.time()))
+
+    def unregister(self, worker):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM workers WHERE name = ?", (worker,))
+
+    def workers(self):
+        """Live workers and their stages"""
+        cutoff = time.time() - self.WORKER_TIMEOUT
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT name, stages FROM workers WHERE heartbeat >= ? "
+                                "ORDER BY name", (cutoff,)).fetchall()
+        return {name: stages.split(",") for name, stages in rows}
+
+    def claim(self, worker, stages, lease_seconds=LEASE_SECONDS):
+        """Lease the oldest runnable task of the given stages, None if there is none"""
+        now = time.time()
+        placeholders = ",".join("?" * len(stages))
+        with self._transaction() as conn:
+            self._expire(conn, now)
+            row = conn.execute("SELECT id, job, stage, payload, attempts FROM tasks "
+                               f"WHERE stage IN ({placeholders}) AND (status = 'pending' "
+                               "OR (status = 'leased' AND expires < ?)) "
+                               "ORDER BY id LIMIT 1", (*stages, now)).fetchone()
+            if row is None:
+                return None
+            task_id, job, stage, payload, attempts = row
+            conn.execute("UPDATE tasks SET status = 'leased', owner = ?, expires = ?, "
+                         "attempts = attempts + 1, updated = ? WHERE id = ?",
+                         (worker, now + lease_seconds, now, task_id))
+        return {"id": task_id, "job": job, "stage": stage, "payload": json.loads(payload),
+                "attempt": attempts + 1}
+
+    def expire(self):
+        """Give up tasks whose worker vanished on their last attempt, returns their jobs"""
+        with self._transaction() as conn:
+            return self._expire(conn, time.time())
+
+    def _expire(self, conn, now):
+        condition = "WHERE status = 'leased' AND expires < ? AND attempts >= ?"
+        jobs = [job for (job,) in conn.execute(f"SELECT job FROM tasks {condition}",
+                                               (now, self.MAX_ATTEMPTS))]
+        conn.execute("UPDATE tasks SET status = 'failed', owner = NULL, updated = ?, "
+                     f"error = COALESCE(error, 'Lease expired') {condition}",
+                     (now, now, self.MAX_ATTEMPTS))
+        return jobs
+
+    def renew(self, task_id, worker, lease_seconds=LEASE_SECONDS):
+        """Extend a lease, False when the task was handed to another worker"""
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute("UPDATE tasks SET expires = ?, updated = ? "
+                                  "WHERE id = ? AND owner = ? AND status = 'leased'",
+                                  (now + lease_seconds, now, task_id, worker))
+            return cursor.rowcount == 1
+
+    def complete(self, task_id, worker, next_tasks=()):
+        """Mark a task done and queue its follow-up (job, stage, payload) tasks in
+        the same transaction. False when the lease was lost, nothing is queued then."""
+        with self._transaction() as conn:
+            cursor = conn.execute("UPDATE tasks SET status = 'done', owner = NULL, "
+                                  "updated = ? WHERE id = ? AND owner = ? "
+                                  "AND status = 'leased'", (time.time(), task_id, worker))
+            if cursor.rowcount != 1:
+                return False
+            for job, stage, payload in next_tasks:
+                self._insert(conn, job, stage, payload)
+            return True
+
+    def fail(self, task_id, worker, error, retry=True):
+        """Give a task back for another attempt, or mark it failed for good.
+        Returns True when the task failed for good, so its job is over."""
+        with self._transaction() as conn:
+            cursor = conn.execute("UPDATE tasks SET status = CASE WHEN ? AND attempts < ? "
+                                  "THEN 'pending' ELSE 'failed' END, owner = NULL, error = ?, "
+                                  "updated = ? WHERE id = ? AND owner = ? AND status = 'leased'",
+                                  (retry, self.MAX_ATTEMPTS, str(error), time.time(),
+                                   task_id, worker))
+            if cursor.rowcount != 1:
+                return False
+            row = conn.execute("SELECT status FROM tasks WHERE id = ?", (task_id,)).fetchone()
+            return row[0] == "failed"
+
+    def release(self, task_id, worker):
+        """Hand a task back unfinished, without counting the attempt"""
+        with self._transaction() as conn:
+            conn.execute("UPDATE tasks SET status = 'pending', owner = NULL, "
+                         "attempts = MAX(0, attempts - 1), updated = ? "
+                         "WHERE id = ? AND owner = ? AND status = 'leased'",
+                         (time.time(), task_id, worker))
+
+    def counts(self):
+        """Number of tasks per (stage, status)"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT stage, status, COUNT(*) FROM tasks "
+                                "GROUP BY stage, status").fetchall()
+        return {(stage, status): count for stage, status, count in rows}
@@ -0,0 +1,191 @@
+"""
+Translation memory for the Video Translator application
+"""
+
+import difflib
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from collections import Counter
+
+import numpy as np
+
+DEFAULT_MEMORY_PATH = os.path.join(os.path.expanduser("~"), ".video_translator",
+                                   "translation_memory.db")
+
+class TranslationMemory:
+    """Reuse stored translations of identical or near-identical segments"""
+
+    NUM_PERM = 32          # MinHash signature length
+    BANDS = 8              # LSH bands of NUM_PERM // BANDS rows each
+    SHINGLE_SIZE = 3       # Character n-grams
+    MAX_CANDIDATES = 32
+    MAX_BUCKET_SCAN = 128  # Entries read per band, bounds lookups on crowded buckets
+    TOKEN_RATIO = 0.75     # Character similarity of a reworded span, spelling variants only
+
+    # Words that change the meaning however similar the rest of the segment is
+    NEGATIONS = frozenset(("no", "not", "never", "none", "nothing", "nobody", "nowhere",
+                           "neither", "nor", "cannot", "without"))
+    NUMBERS = frozenset(("zero", "one", "two", "three", "four", "five", "six", "seven",
+                         "eight", "nine", "ten", "eleven", "twelve", "thirteen",
+                         "fourteen", "fifteen", "sixteen", "seventeen", "eighteen",
+                         "nineteen", "twenty", "thirty", "forty", "fifty", "sixty",
+                         "seventy", "eighty", "ninety", "hundred", "thousand",
+                         "million", "billion", "first", "second", "third", "half"))
+
+    # Fixed seeds so signatures stay comparable across runs
+    _rng = np.random.default_rng(20231117)
+    _MULT = _rng.integers(1, 2 ** 63, size=NUM_PERM, dtype=np.uint64) | np.uint64(1)
+    _ADD = _rng.integers(0, 2 ** 63, size=NUM_PERM, dtype=np.uint64)
+
+    def __init__(self, db_path=DEFAULT_MEMORY_PATH, threshold=0.85):
+        self.db_path = db_path
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS entries ("
+                               "id INTEGER PRIMARY KEY, pair TEXT, source TEXT, "
+                               "target TEXT, signature BLOB)")
+            self._conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS entries_source "
+                               "ON entries (pair, source)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS buckets ("
+                               "key INTEGER, entry_id INTEGER, "
+                               "PRIMARY KEY (key, entry_id)) WITHOUT ROWID")
+
+    def close(self):
+        """Close the database connection"""
+        self._conn.close()
+
+    @staticmethod
+    def language_pair(src_lang, dest_lang):
+        """Key translations by source and target language"""
+        return f"{src_lang or 'auto'}>{dest_lang}"
+
+    @staticmethod
+    def _normalize(text):
+        return re.sub(r"\s+", " ", text.strip().lower())
+
+    @staticmethod
+    def _signature(normalized):
+        """MinHash signature over character shingles"""
+        size = TranslationMemory.SHINGLE_SIZE
+        padded = f" {normalized} "
+        shingles = {padded[i:i + size] for i in range(max(1, len(padded) - size + 1))}
+        values = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles),
+                             dtype=np.uint64, count=len(shingles))
+        # Multiply-shift hashing, uint64 arithmetic wraps on purpose
+        hashed = (values[:, None] * TranslationMemory._MULT + TranslationMemory._ADD) >> np.uint64(32)
+        return hashed.min(axis=0).astype(np.uint32)
+
+    @staticmethod
+    def _band_keys(pair, signature):
+        rows = TranslationMemory.NUM_PERM // TranslationMemory.BANDS
+        keys = []
+        for band in range(TranslationMemory.BANDS):
+            digest = hashlib.blake2b(signature[band * rows:(band + 1) * rows].tobytes(),
+                                     digest_size=8, key=f"{pair}#{band}".encode("utf-8")[:64])
+            keys.append(int.from_bytes(digest.digest(), "big", signed=True))
+        return keys
+
+    @staticmethod
+    def _changes_meaning(token):
+        return (any(char.isdigit() for char in token) or token.endswith("n't")
+                or token in TranslationMemory.NEGATIONS or token in TranslationMemory.NUMBERS)
+
+    @staticmethod
+    def _same_wording(query, source):
+        """Whether two similar segments differ only in spelling or punctuation.
+        Character shingles score "do" and "don't" or "six" and "seven" as close,
+        so every differing word span must be a spelling variant of the other
+        and no word may be added, dropped, negated or carry a number."""
+        query_tokens = re.findall(r"[\w']+", query)
+        source_tokens = re.findall(r"[\w']+", source)
+        matcher = difflib.SequenceMatcher(None, query_tokens, source_tokens, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                continue
+            if tag != "replace":
+                return False
+            changed = query_tokens[i1:i2] + source_tokens[j1:j2]
+            if any(TranslationMemory._changes_meaning(token) for token in changed):
+                return False
+            ratio = difflib.SequenceMatcher(None, " ".join(query_tokens[i1:i2]),
+                                            " ".join(source_tokens[j1:j2])).ratio()
+            if ratio < TranslationMemory.TOKEN_RATIO:
+                return False
+        return True
+
+    def lookup(self, text, pair):
+        """Return the stored translation of text or of a close enough segment"""
+        normalized = self._normalize(text)
+        if not normalized:
+            return None
+
+        with self._lock:
+            row = self._conn.execute("SELECT target FROM entries WHERE pair = ? AND source = ?",
+                                     (pair, normalized)).fetchone()
+            if row:
+                return row[0]
+
+            signature = self._signature(normalized)
+            # Entries sharing more bands are likely closer. A crowded band matches
+            # many entries (e.g. a recurring phrase) and says little about which
+            # is closest, so it only breaks ties or is used when nothing else matches.
+            shared = Counter()
+            crowded = Counter()
+            for key in self._band_keys(pair, signature):
+                bucket = [entry_id for (entry_id,) in self._conn.execute(
+                    "SELECT entry_id FROM buckets WHERE key = ? LIMIT ?",
+                    (key, self.MAX_BUCKET_SCAN + 1))]
+                (crowded if len(bucket) > self.MAX_BUCKET_SCAN else shared).update(bucket)
+            ids = sorted(shared or crowded, key=lambda entry_id: (shared[entry_id],
+                                                                 crowded[entry_id]),
+                         reverse=True)[:self.MAX_CANDIDATES]
+            if not ids:
+                return None
+
+            placeholders = ",".join("?" * len(ids))
+            rows = self._conn.execute(
+                f"SELECT source, target, signature FROM entries WHERE id IN ({placeholders})",
+                ids).fetchall()
+
+        # Share of equal MinHash values estimates the Jaccard similarity
+        scored = []
+        for source, target, blob in rows:
+            score = float(np.mean(np.frombuffer(blob, dtype=np.uint32) == signature))
+            if score >= self.threshold:
+                scored.append((score, source, target))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        for _, source, target in scored:
+            if self._same_wording(normalized, source):
+                return target
+        return None
+
+    def add(self, text, translated, pair):
+        """Store a translation"""
+        self.add_many([(text, translated)], pair)
+
+    def add_many(self, items, pair):
+        """Store (text, translation) pairs in one transaction"""
+        with self._lock, self._conn:
+            for text, translated in items:
+                normalized = self._normalize(text)
+                if not normalized or not translated:
+                    continue
+                signature = self._signature(normalized)
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO entries (pair, source, target, signature) "
+                    "VALUES (?, ?, ?, ?)",
+                    (pair, normalized, translated, signature.tobytes()))
+                if cursor.rowcount:
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO buckets (key, entry_id) VALUES (?, ?)",
+                        [(key, cursor.lastrowid) for key in self._band_keys(pair, signature)])
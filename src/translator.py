@@ -2,31 +2,46 @@
 Translation functions for the Video Translator application
 """
 
-from googletrans import Translator
+from concurrent.futures import ThreadPoolExecutor
+
+from googletrans import LANGUAGES, Translator
+
+from cancellation import CancelledError
 
 class TranslatorEngine:
     """Handle text translation"""
     
+    BATCH_CHARS = 4000  # Segments sent together in one request
+    # Whisper language codes that googletrans knows under another name
+    SOURCE_CODES = {"zh": "zh-cn", "yue": "zh-tw"}
+    
     def __init__(self):
         self.translator = Translator()
     
-    def translate_text(self, text, dest_lang="ar", progress_callback=None):
+    def translate_text(self, text, dest_lang="ar", progress_callback=None, cancel_token=None):
         """Translate text to target language"""
         try:
+            if cancel_token:
+                cancel_token.raise_if_cancelled()
             if len(text) > 5000:
-                return self._translate_large_text(text, dest_lang, progress_callback)
+                return self._translate_large_text(text, dest_lang, progress_callback,
+                                                  cancel_token)
             else:
                 return self._translate_small_text(text, dest_lang, progress_callback)
+        except CancelledError:
+            raise
         except Exception as e:
             raise Exception(f"Error in translation: {e}")
     
-    def _translate_large_text(self, text, dest_lang, progress_callback=None):
+    def _translate_large_text(self, text, dest_lang, progress_callback=None, cancel_token=None):
         """Translate large text by splitting into chunks"""
         chunks = [text[i:i+4000] for i in range(0, len(text), 4000)]
         translated_chunks = []
         total_chunks = len(chunks)
         
         for idx, chunk in enumerate(chunks):
+            if cancel_token:
+                cancel_token.raise_if_cancelled()
             try:
                 if progress_callback:
                     progress = int((idx / total_chunks) * 100)
@@ -55,4 +70,111 @@ class TranslatorEngine:
         if progress_callback:
             progress_callback(90, "Translation complete")
         
-        return res.text
\ No newline at end of file
+        return res.text
+    
+    def translate_segments(self, texts, dest_lang="ar", src_lang=None, 
+                           memory=None, progress_callback=None, concurrency=1,
+                           cancel_token=None):
+        """Translate a list of segments, only sending ones the memory doesn't know.
+        Once cancel_token is cancelled no further requests are sent."""
+        try:
+            results = [None] * len(texts)
+            pair = memory.language_pair(src_lang, dest_lang) if memory else None
+            
+            pending = []
+            for idx, text in enumerate(texts):
+                stored = memory.lookup(text, pair) if memory and text.strip() else None
+                if stored is not None:
+                    results[idx] = stored
+                elif text.strip():
+                    pending.append(idx)
+                else:
+                    results[idx] = ""
+            
+            batches = self._batch_segments(texts, pending)
+            total_batches = len(batches)
+            with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+                futures = [executor.submit(self._translate_batch,
+                                           [texts[idx] for idx in batch],
+                                           dest_lang, src_lang, cancel_token)
+                           for batch in batches]
+                try:
+                    # Requests run concurrently, results are consumed in order
+                    translated_batches = zip(batches, (future.result() for future in futures))
+                    translated_batches = list(self._with_progress(translated_batches,
+                                                                  total_batches,
+                                                                  progress_callback))
+                except BaseException:
+                    # On failure don't start the batches still waiting
+                    for future in futures:
+                        future.cancel()
+                    raise
+            
+            for batch, translations in translated_batches:
+                for idx, translated in zip(batch, translations):
+                    results[idx] = translated
+                if memory:
+                    memory.add_many([(texts[idx], results[idx]) for idx in batch], pair)
+            
+            if progress_callback:
+                progress_callback(90, f"Translation complete "
+                                      f"({len(texts) - len(pending)} of {len(texts)} from memory)")
+            
+            return results
+        except CancelledError:
+            raise
+        except Exception as e:
+            raise Exception(f"Error in translation: {e}")
+    
+    @staticmethod
+    def _with_progress(batches, total_batches, progress_callback):
+        """Report progress as translated batches come in"""
+        for batch_idx, item in enumerate(batches):
+            if progress_callback:
+                progress = int(((batch_idx + 1) / total_batches) * 100)
+                progress_callback(70 + int(progress * 0.2), 
+                                f"Translated part {batch_idx+1} of {total_batches}")
+            yield item
+    
+    def _batch_segments(self, texts, indices):
+        """Group segment indices into requests of at most BATCH_CHARS characters"""
+        batches = []
+        current = []
+        current_length = 0
+        for idx in indices:
+            length = len(texts[idx]) + 1
+            if current and current_length + length > self.BATCH_CHARS:
+                batches.append(current)
+                current = []
+                current_length = 0
+            current.append(idx)
+            current_length += length
+        if current:
+            batches.append(current)
+        return batches
+    
+    def _translate_batch(self, texts, dest_lang, src_lang=None, cancel_token=None):
+        """Translate segments joined by newlines, one by one if lines get merged"""
+        if cancel_token:
+            cancel_token.raise_if_cancelled()
+        src = self._source_language(src_lang)
+        res = self.translator.translate("\n".join(texts), dest=dest_lang, src=src)
+        lines = res.text.split("\n")
+        if len(lines) == len(texts):
+            return [line.strip() for line in lines]
+        
+        results = []
+        for text in texts:
+            if cancel_token:
+                cancel_token.raise_if_cancelled()
+            results.append(self.translator.translate(text, dest=dest_lang, src=src).text)
+        return results
+    
+    @staticmethod
+    def _source_language(src_lang):
+        """googletrans code for a Whisper language, "auto" when it has none,
+        since googletrans rejects source codes it doesn't know"""
+        if not src_lang:
+            return "auto"
+        src = TranslatorEngine.SOURCE_CODES.get(src_lang.lower(), src_lang.lower())
+        return src if src in LANGUAGES else "auto"
@@ -6,6 +6,8 @@ import os
 import subprocess
 import time
 
+from media_info import MediaInfo
+
 class FileUtils:
     """File utility functions"""
     
@@ -34,6 +36,18 @@ class FileUtils:
             print(f"Warning: Could not delete {file_path}: {e}")
         return False
 
+    @staticmethod
+    def is_up_to_date(source_path, output_paths):
+        """Check that all outputs exist and are newer than the source file"""
+        try:
+            source_mtime = os.path.getmtime(source_path)
+            for output_path in output_paths:
+                if os.path.getmtime(output_path) < source_mtime:
+                    return False
+            return bool(output_paths)
+        except OSError:
+            return False
+
 class TimeUtils:
     """Time utility functions"""
     
@@ -51,18 +65,23 @@ class TimeUtils:
         return time.strftime("%H:%M:%S")
     
     @staticmethod
-    def get_video_duration(video_path):
-        """Get video duration using ffprobe"""
+    def parse_time(value):
+        """Parse seconds or [HH:]MM:SS[.mmm], empty values give None"""
+        value = str(value).strip() if value is not None else ""
+        if not value:
+            return None
         try:
-            cmd = [
-                "ffprobe", "-v", "error", "-show_entries", "format=duration",
-                "-of", "default=noprint_wrappers=1:nokey=1", video_path
-            ]
-            result = subprocess.run(cmd, stdout=subprocess.PIPE, 
-                                  stderr=subprocess.PIPE, check=True)
-            return float(result.stdout.decode().strip())
-        except:
-            return 60  # Default 60 seconds
+            seconds = 0.0
+            for part in value.split(":"):
+                seconds = seconds * 60 + float(part)
+            return seconds
+        except ValueError:
+            raise Exception(f"Invalid time value: {value}")
+    
+    @staticmethod
+    def get_video_duration(video_path):
+        """Get video duration from the cached ffprobe metadata"""
+        return MediaInfo.probe(video_path).duration
 
 class SystemChecker:
     """Check system requirements"""
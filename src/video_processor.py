@@ -3,24 +3,141 @@ Video processing functions for the Video Translator application
 """
 
 import os
+import re
 import subprocess
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing, contextmanager, nullcontext
+
+import numpy as np
+import torch
 import whisper
 
+from cancellation import CancelledError
+
+class ModelPool:
+    """Share loaded Whisper models between jobs, keeping the most recently used ones"""
+    
+    MAX_MODELS = 2   # Models kept loaded, older ones are released when not in use
+    
+    _models = OrderedDict()
+    _locks = {}
+    _pool_lock = threading.Lock()
+    
+    @staticmethod
+    @contextmanager
+    def acquire(model_size, quantized=False, cancel_token=None):
+        """Borrow a model exclusively, Whisper installs decoding hooks on it.
+        With a cancel token decoding stops at the next encoder or decoder pass."""
+        key = (model_size, quantized)
+        with ModelPool._pool_lock:
+            model_lock = ModelPool._locks.setdefault(key, threading.Lock())
+        while not model_lock.acquire(timeout=0.5):
+            if cancel_token:
+                cancel_token.raise_if_cancelled()
+        try:
+            with ModelPool._pool_lock:
+                model = ModelPool._models.get(key)
+                if model is not None:
+                    ModelPool._models.move_to_end(key)
+            if model is None:
+                model = ModelPool.load(model_size, quantized)
+                with ModelPool._pool_lock:
+                    ModelPool._models[key] = model
+                    ModelPool._evict()
+            if cancel_token is None:
+                yield model
+                return
+            
+            check = lambda module, args: cancel_token.raise_if_cancelled()
+            handles = [model.encoder.register_forward_pre_hook(check),
+                       model.decoder.register_forward_pre_hook(check)]
+            try:
+                yield model
+            except CancelledError:
+                # Whisper does not always remove its own hooks when a pass is
+                # interrupted, so the next job gets a freshly loaded model
+                with ModelPool._pool_lock:
+                    ModelPool._models.pop(key, None)
+                raise
+            finally:
+                for handle in handles:
+                    handle.remove()
+        finally:
+            model_lock.release()
+    
+    @staticmethod
+    def _evict():
+        """Release least recently used models beyond MAX_MODELS, skipping borrowed ones.
+        Called with the pool lock held."""
+        for key in list(ModelPool._models):
+            if len(ModelPool._models) <= ModelPool.MAX_MODELS:
+                return
+            model_lock = ModelPool._locks[key]
+            if model_lock.acquire(blocking=False):
+                del ModelPool._models[key]
+                model_lock.release()
+    
+    @staticmethod
+    def load(model_size, quantized=False):
+        """Load a model, int8-quantized for CPU inference if requested"""
+        if not quantized:
+            return whisper.load_model(model_size)
+        return ModelPool.quantize(whisper.load_model(model_size, device="cpu"))
+    
+    @staticmethod
+    def quantize(model):
+        """Apply dynamic int8 quantization to the linear layers"""
+        # Whisper subclasses nn.Linear only to cast weights to the input dtype,
+        # which is a no-op in FP32. quantize_dynamic matches exact types, so
+        # turn them back into plain nn.Linear first.
+        for module in model.modules():
+            if isinstance(module, torch.nn.Linear):
+                module.__class__ = torch.nn.Linear
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, 
+                                                   dtype=torch.qint8)
+    
+    @staticmethod
+    def clear():
+        """Release all loaded models"""
+        with ModelPool._pool_lock:
+            ModelPool._models.clear()
+
 class VideoProcessor:
     """Handle video and audio processing"""
     
     AUDIO_TEMP = "temp_audio.wav"
+    SAMPLE_RATE = 16000
+    STREAM_WINDOW = 300  # Seconds of audio decoded per streaming window
+    STREAM_CARRY = 30    # Max seconds after the last complete segment decoded again
+    PREVIEW_HEIGHT = 360
+    
+    @staticmethod
+    def _input_args(video_path, start=None, end=None):
+        """Input arguments, seeking before -i so ffmpeg skips straight to the range"""
+        args = []
+        if start:
+            args += ["-ss", f"{start:.3f}"]
+        if end is not None:
+            args += ["-t", f"{end - (start or 0):.3f}"]
+        return args + ["-i", video_path]
     
     @staticmethod
-    def extract_audio(video_path, out_audio=AUDIO_TEMP, progress_callback=None):
-        """Extract audio from video using ffmpeg"""
+    def extract_audio(video_path, out_audio=AUDIO_TEMP, progress_callback=None,
+                      audio_stream=None, duration=None, start=None, end=None, threads=None,
+                      cancel_token=None):
+        """Extract audio from video using ffmpeg, optionally only a time range"""
         try:
-            cmd = [
-                "ffmpeg", "-y", "-i", video_path,
-                "-ac", "1", "-ar", "16000", "-acodec", "pcm_s16le", out_audio
-            ]
-            result = subprocess.run(cmd, stdout=subprocess.DEVNULL, 
-                                  stderr=subprocess.DEVNULL, check=True)
+            cmd = ["ffmpeg", "-y"] + VideoProcessor._input_args(video_path, start, end)
+            if audio_stream is not None:
+                cmd += ["-map", f"0:a:{audio_stream}"]
+            cmd += ["-ac", "1", "-ar", "16000", "-acodec", "pcm_s16le"]
+            if threads:
+                cmd += ["-threads", str(threads)]
+            cmd.append(out_audio)
+            VideoProcessor._run_ffmpeg(cmd, duration, progress_callback, 
+                                      (10, 30), "Extracting audio", cancel_token)
             if progress_callback:
                 progress_callback(100, "Audio extraction complete")
             return out_audio
@@ -28,16 +145,53 @@ class VideoProcessor:
             raise Exception(f"Error extracting audio: {e}")
     
     @staticmethod
-    def transcribe_with_whisper(audio_path, model_size="small", progress_callback=None):
-        """Convert audio to text using Whisper"""
+    def _run_ffmpeg(cmd, duration=None, progress_callback=None, 
+                    progress_range=(0, 100), message="", cancel_token=None):
+        """Run ffmpeg, reporting real progress when the input duration is known.
+        A cancelled run is terminated and its partial output (the last argument)
+        removed."""
+        tracked = bool(progress_callback and duration)
+        if not tracked and not cancel_token:
+            subprocess.run(cmd, stdout=subprocess.DEVNULL, 
+                         stderr=subprocess.DEVNULL, check=True)
+            return
+        
+        if tracked:
+            cmd = cmd[:1] + ["-progress", "pipe:1", "-nostats"] + cmd[1:]
+        process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL,
+                                 stdout=subprocess.PIPE if tracked else subprocess.DEVNULL, 
+                                 stderr=subprocess.DEVNULL, text=True)
+        with cancel_token.process(process) if cancel_token else nullcontext():
+            if tracked:
+                low, high = progress_range
+                for line in process.stdout:
+                    key, _, value = line.strip().partition("=")
+                    if key == "out_time_us" and value.isdigit():
+                        fraction = min(1.0, int(value) / 1e6 / duration)
+                        progress_callback(low + int(fraction * (high - low)), 
+                                        f"{message}... {int(fraction * 100)}%")
+            returncode = process.wait()
+        if cancel_token and cancel_token.cancelled:
+            try:
+                os.remove(cmd[-1])
+            except OSError:
+                pass
+            cancel_token.raise_if_cancelled()
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, cmd)
+    
+    @staticmethod
+    def transcribe_with_whisper(audio_path, model_size="small", progress_callback=None,
+                                threads=None, language=None, quantized=False,
+                                word_timestamps=False, cancel_token=None):
+        """Convert audio to text using Whisper. The result's decode_seconds is the
+        time spent decoding, without waiting for or loading the model."""
         try:
-            model = whisper.load_model(model_size)
+            if threads:
+                torch.set_num_threads(threads)
             
             # Simulate progress for long operations
             if progress_callback:
-                import time
-                import threading
-                
                 def simulate_progress():
                     for i in range(0, 101, 10):
                         if progress_callback:
@@ -49,22 +203,184 @@ class VideoProcessor:
                                                  daemon=True)
                 progress_thread.start()
             
-            result = model.transcribe(
-                audio_path,
-                fp16=False,  # Force FP32 to avoid warning
-                language=None  # Auto-detect language
-            )
+            with ModelPool.acquire(model_size, quantized, cancel_token) as model:
+                started = time.monotonic()
+                result = model.transcribe(
+                    audio_path,
+                    fp16=False,  # Force FP32 to avoid warning
+                    language=language,  # None auto-detects the language
+                    word_timestamps=word_timestamps
+                )
+                result["decode_seconds"] = time.monotonic() - started
             
             if progress_callback:
                 progress_callback(70, "Audio transcription complete")
             
             return result
+        except CancelledError:
+            raise
         except Exception as e:
             raise Exception(f"Error transcribing audio: {e}")
     
     @staticmethod
-    def burn_subtitles(video_path, subtitle_path, output_path, progress_callback=None):
-        """Burn subtitles to video with enhanced styling"""
+    def detect_language(video_path, model_size="small", audio_stream=None, start=None,
+                        seconds=30, quantized=False, cancel_token=None):
+        """Detect the spoken language from the first seconds, returns (language, probability)"""
+        try:
+            if model_size.endswith(".en"):
+                return "en", 1.0
+            
+            windows = VideoProcessor.stream_audio(video_path, seconds, audio_stream, 
+                                                  start, (start or 0.0) + seconds,
+                                                  cancel_token)
+            window = next(windows, None)
+            windows.close()
+            if window is None:
+                return None, 0.0
+            
+            with ModelPool.acquire(model_size, quantized, cancel_token) as model:
+                mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(window[1]), 
+                                                  n_mels=model.dims.n_mels)
+                _, probs = model.detect_language(mel.to(model.device))
+            language = max(probs, key=probs.get)
+            return language, probs[language]
+        except CancelledError:
+            raise
+        except Exception as e:
+            raise Exception(f"Error detecting language: {e}")
+    
+    @staticmethod
+    def stream_audio(video_path, window_seconds=STREAM_WINDOW, audio_stream=None, 
+                     start=None, end=None, cancel_token=None):
+        """Yield (offset, samples) windows of 16 kHz mono audio read from an ffmpeg pipe"""
+        cmd = ["ffmpeg", "-nostdin"] + VideoProcessor._input_args(video_path, start, end)
+        if audio_stream is not None:
+            cmd += ["-map", f"0:a:{audio_stream}"]
+        cmd += ["-f", "s16le", "-ac", "1", "-ar", str(VideoProcessor.SAMPLE_RATE), "-"]
+        window_bytes = int(window_seconds * VideoProcessor.SAMPLE_RATE) * 2
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, 
+                                 stderr=subprocess.DEVNULL)
+        offset = start or 0.0
+        try:
+            with cancel_token.process(process) if cancel_token else nullcontext():
+                while True:
+                    data = process.stdout.read(window_bytes)
+                    if cancel_token:
+                        cancel_token.raise_if_cancelled()
+                    if not data:
+                        break
+                    # Only one window of samples is alive at a time
+                    samples = np.frombuffer(data, np.int16).astype(np.float32) / 32768.0
+                    yield offset, samples
+                    offset += len(samples) / VideoProcessor.SAMPLE_RATE
+        finally:
+            process.stdout.close()
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+        
+        if offset == (start or 0.0) and process.returncode != 0:
+            raise Exception(f"Error streaming audio: ffmpeg exited with code {process.returncode}")
+    
+    @staticmethod
+    def stream_transcribe(video_path, model_size="small", window_seconds=STREAM_WINDOW,
+                          language=None, progress_callback=None, audio_stream=None, 
+                          duration=None, start=None, end=None, threads=None, 
+                          quantized=False, cancel_token=None, stats=None):
+        """Transcribe audio window by window, yielding segments as they are decoded.
+        The audio after a window's last complete segment is decoded again at the
+        start of the next window, so words at the boundary are not cut. A stats
+        dict collects decode_seconds, the time spent decoding once the model was
+        acquired."""
+        try:
+            if threads:
+                torch.set_num_threads(threads)
+            rate = VideoProcessor.SAMPLE_RATE
+            prompt = None
+            carry = None       # Audio held back from the previous window
+            carry_start = None
+            
+            windows = VideoProcessor.stream_audio(video_path, window_seconds, audio_stream,
+                                                  start, end, cancel_token)
+            with closing(windows):
+                while True:
+                    window = next(windows, None)
+                    if window is None and carry is None:
+                        break
+                    if window is None:
+                        audio, audio_start = carry, carry_start
+                    elif carry is not None:
+                        audio, audio_start = np.concatenate((carry, window[1])), carry_start
+                    else:
+                        audio_start, audio = window
+                    audio_seconds = len(audio) / rate
+                    window_end = audio_start + audio_seconds
+                    with ModelPool.acquire(model_size, quantized, cancel_token) as model:
+                        decode_started = time.monotonic()
+                        result = model.transcribe(
+                            audio,
+                            fp16=False,
+                            language=language,
+                            initial_prompt=prompt  # Carry context across window boundaries
+                        )
+                    if stats is not None:
+                        stats["decode_seconds"] = (stats.get("decode_seconds", 0.0)
+                                                   + time.monotonic() - decode_started)
+                    # Keep the language detected in the first window for the rest
+                    language = language or result.get("language")
+                    
+                    segments = [segment for segment in result.get("segments", [])
+                                if segment["text"].strip()]
+                    cut = audio_seconds
+                    if window is not None and segments:
+                        # The last segment may run into the next window, hold it back
+                        # unless that would carry more than STREAM_CARRY seconds
+                        if audio_seconds - segments[-1]["start"] <= VideoProcessor.STREAM_CARRY:
+                            cut = segments.pop()["start"]
+                    carry = audio[int(cut * rate):] if cut < audio_seconds else None
+                    carry_start = audio_start + cut
+                    
+                    for segment in segments:
+                        # Slim segments only: tokens and audio are dropped with the window
+                        yield {
+                            "start": audio_start + segment["start"],
+                            "end": min(audio_start + segment["end"], window_end),
+                            "text": segment["text"].strip(),
+                        }
+                    
+                    text = " ".join(segment["text"].strip() for segment in segments)
+                    prompt = text[-200:] or prompt
+                    del result, audio, window
+                    
+                    done_until = audio_start + cut
+                    if progress_callback and duration:
+                        done = done_until - (start or 0.0)
+                        fraction = min(1.0, done / duration)
+                        progress_callback(30 + int(fraction * 40), 
+                                        f"Transcribed {done / 60:.1f} of {duration / 60:.1f} minutes...")
+                    elif progress_callback:
+                        progress_callback(50, f"Transcribed {done_until / 60:.1f} minutes...")
+        except CancelledError:
+            raise
+        except Exception as e:
+            raise Exception(f"Error transcribing audio stream: {e}")
+    
+    @staticmethod
+    def _filter_path(path):
+        """Escape a file path for use as a filter option inside -vf.
+        ffmpeg unescapes the filtergraph first and the option value second,
+        so Windows drive letters, quotes and commas need both levels."""
+        path = path.replace("\\", "/")
+        # Option value level: quoted, a quote in the path ends and restarts the quoting
+        value = "'" + path.replace("'", "'\\''") + "'"
+        # Filtergraph level
+        return re.sub(r"([\\'\[\],;])", r"\\\1", value)
+    
+    @staticmethod
+    def burn_subtitles(video_path, subtitle_path, output_path, progress_callback=None,
+                       audio_stream=None, duration=None, start=None, end=None, 
+                       preview=False, threads=None, cancel_token=None):
+        """Burn subtitles to video with enhanced styling, optionally only a time range"""
         try:
             if progress_callback:
                 progress_callback(95, "Burning subtitles to video...")
@@ -82,16 +398,32 @@ class VideoProcessor:
                 "MarginL=10,MarginR=10,MarginV=30'"  # Margins
             )
             
-            cmd = [
-                "ffmpeg", "-y", "-i", video_path,
-                "-vf", f"subtitles={subtitle_path}:{subtitle_style}",
+            filters = [f"subtitles={VideoProcessor._filter_path(subtitle_path)}:{subtitle_style}"]
+            if start:
+                # Seeking resets timestamps to zero, move frames back onto the
+                # SRT's timeline for rendering and reset them afterwards
+                filters = [f"setpts=PTS+{start:.3f}/TB"] + filters + ["setpts=PTS-STARTPTS"]
+            if preview:
+                filters = [f"scale=-2:{VideoProcessor.PREVIEW_HEIGHT}"] + filters
+            
+            cmd = ["ffmpeg", "-y"] + VideoProcessor._input_args(video_path, start, end)
+            if audio_stream is not None:
+                # Keep the transcribed audio track rather than ffmpeg's default pick
+                cmd += ["-map", "0:v:0", "-map", f"0:a:{audio_stream}"]
+            cmd += [
+                "-vf", ",".join(filters),
                 "-c:a", "copy",
-                "-preset", "medium",
-                output_path
             ]
+            if preview:
+                cmd += ["-preset", "ultrafast", "-crf", "30"]
+            else:
+                cmd += ["-preset", "medium"]
+            if threads:
+                cmd += ["-threads", str(threads)]
+            cmd.append(output_path)
             
-            result = subprocess.run(cmd, stdout=subprocess.DEVNULL, 
-                                  stderr=subprocess.DEVNULL, check=True)
+            VideoProcessor._run_ffmpeg(cmd, duration, progress_callback, 
+                                      (95, 100), "Burning subtitles", cancel_token)
             
             if progress_callback:
                 progress_callback(100, "Subtitle burning complete")
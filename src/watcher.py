@@ -0,0 +1,192 @@
+"""
+Watch-folder ingestion for the Video Translator application
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from batch_transcriber import BatchTranscriber
+from cancellation import CancellationToken, CancelledError
+from model_selector import ModelSelector
+from pipeline import VideoPipeline
+from scheduler import ResourceScheduler
+from translator import TranslatorEngine
+from utils import FileUtils, TimeUtils
+from workspace import Workspace
+
+class FolderWatcher:
+    """Poll folders for new or changed videos and process them in the background"""
+
+    VIDEO_EXTENSIONS = (".mp4", ".mkv", ".mov", ".avi", ".wmv", ".flv", ".webm")
+    OUTPUT_SUBDIR = "translated"
+
+    def __init__(self, folders, max_workers=2, poll_interval=2.0,
+                 settle_time=5.0, batch_size=1, scheduler=None, log_callback=None):
+        """
+        folders: list of {"path": ..., "settings": {...}} entries. Settings are
+        pipeline settings; output_dir defaults to a subfolder of the watched folder.
+        batch_size > 1 decodes windows of concurrent jobs together on one model.
+        scheduler: CPU budget shared by all jobs, stages of different jobs overlap.
+        """
+        self.folders = [self._normalize_folder(folder) for folder in folders]
+        self.max_workers = max_workers
+        self.poll_interval = poll_interval
+        self.settle_time = settle_time
+        self.batch_size = batch_size
+        self.scheduler = scheduler or ResourceScheduler()
+        self.log_callback = log_callback or print
+
+        self._observed = {}   # path -> (size, mtime, first time seen with this size)
+        self._handled = {}    # path -> (size, mtime) already submitted
+        self._active = {}     # path -> CancellationToken of its job
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._executor = None
+        self._batch_transcribers = {}  # (model size, quantized) -> BatchTranscriber
+
+    @staticmethod
+    def from_config(config_path, **kwargs):
+        """Create a watcher from a JSON config file"""
+        with open(config_path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        kwargs.setdefault("max_workers", config.get("max_workers", 2))
+        kwargs.setdefault("poll_interval", config.get("poll_interval", 2.0))
+        kwargs.setdefault("settle_time", config.get("settle_time", 5.0))
+        kwargs.setdefault("batch_size", config.get("batch_size", 1))
+        if "scheduler" not in kwargs and config.get("max_cpus"):
+            kwargs["scheduler"] = ResourceScheduler(max_cpus=config["max_cpus"])
+        return FolderWatcher(config["folders"], **kwargs)
+
+    def _normalize_folder(self, folder):
+        path = os.path.abspath(folder["path"])
+        settings = VideoPipeline.build_settings(folder.get("settings"))
+        if not settings["output_dir"]:
+            settings["output_dir"] = os.path.join(path, self.OUTPUT_SUBDIR)
+        return {"path": path, "settings": settings}
+
+    def log(self, msg):
+        """Log a message with a timestamp"""
+        self.log_callback(f"[{TimeUtils.get_timestamp()}] {msg}")
+
+    def run(self):
+        """Watch folders until stop() is called"""
+        self.log(f"Watching {len(self.folders)} folder(s) "
+                 f"with up to {self.max_workers} concurrent job(s)")
+        self.log(f"CPU budget: {self.scheduler.describe()}")
+        for path in Workspace.remove_stale():
+            self.log(f"Removed stale workspace: {path}")
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            while not self._stop_event.is_set():
+                self.scan_once()
+                self._stop_event.wait(self.poll_interval)
+        except BaseException:
+            # Interrupted: don't wait for the running jobs to finish
+            self._cancel_running("Watcher interrupted")
+            raise
+        finally:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+            for transcriber in self._batch_transcribers.values():
+                transcriber.close()
+            self._batch_transcribers.clear()
+
+    def stop(self, cancel=False):
+        """Stop watching after the running jobs finish, or cancel them"""
+        self._stop_event.set()
+        if cancel:
+            self._cancel_running("Watcher stopped")
+
+    def _cancel_running(self, reason):
+        with self._lock:
+            tokens = list(self._active.values())
+        for token in tokens:
+            token.cancel(reason)
+
+    def scan_once(self):
+        """Check every folder once and submit files that are ready"""
+        now = time.monotonic()
+        for folder in self.folders:
+            for video_path in self._list_videos(folder["path"]):
+                if self._is_ready(video_path, now):
+                    self._submit(video_path, folder["settings"])
+
+    def _list_videos(self, folder_path):
+        try:
+            entries = list(os.scandir(folder_path))
+        except OSError as e:
+            self.log(f"⚠ Cannot read {folder_path}: {e}")
+            return []
+        return [entry.path for entry in entries
+                if entry.is_file() and entry.name.lower().endswith(self.VIDEO_EXTENSIONS)]
+
+    def _is_ready(self, video_path, now):
+        """Debounce: a file is ready once its size has stopped changing"""
+        try:
+            stat = os.stat(video_path)
+        except OSError:
+            self._observed.pop(video_path, None)
+            return False
+
+        signature = (stat.st_size, stat.st_mtime)
+        with self._lock:
+            if video_path in self._active or self._handled.get(video_path) == signature:
+                return False
+
+        previous = self._observed.get(video_path)
+        if previous is None or previous[:2] != signature:
+            self._observed[video_path] = (stat.st_size, stat.st_mtime, now)
+            return False
+        return stat.st_size > 0 and now - previous[2] >= self.settle_time
+
+    def _submit(self, video_path, settings):
+        signature = self._observed.pop(video_path)[:2]
+        with self._lock:
+            self._handled[video_path] = signature
+
+        outputs = list(VideoPipeline.output_paths(video_path, settings).values())
+        if FileUtils.is_up_to_date(video_path, outputs):
+            return
+
+        token = CancellationToken()
+        with self._lock:
+            self._active[video_path] = token
+        self.log(f"Queued: {os.path.basename(video_path)}")
+        self._executor.submit(self._process, video_path, settings, token)
+
+    def _batch_transcriber(self, model_size, quantized=False):
+        """Share one batch transcriber per model between concurrent jobs"""
+        if self.batch_size <= 1 or model_size == ModelSelector.AUTO:
+            return None  # "auto" is resolved per file
+        key = (model_size, quantized)
+        with self._lock:
+            if key not in self._batch_transcribers:
+                self._batch_transcribers[key] = BatchTranscriber(
+                    model_size, self.batch_size, scheduler=self.scheduler, quantized=quantized)
+            return self._batch_transcribers[key]
+
+    def _process(self, video_path, settings, cancel_token):
+        name = os.path.basename(video_path)
+        try:
+            cancel_token.raise_if_cancelled()
+            pipeline = VideoPipeline(translator=TranslatorEngine(),
+                                     log_callback=lambda msg: self.log(f"{name}: {msg}"),
+                                     batch_transcriber=self._batch_transcriber(settings["model_size"],
+                                                                               settings["quantized"]),
+                                     scheduler=self.scheduler,
+                                     cancel_token=cancel_token)
+            result = pipeline.process(video_path, settings)
+            self.log(f"✓ Finished {name} ({len(result['files'])} file(s) created)")
+        except CancelledError as e:
+            self.log(f"⚠ {name}: cancelled ({e})")
+            with self._lock:
+                # Pick the file up again on the next scan
+                self._handled.pop(video_path, None)
+        except Exception as e:
+            self.log(f"❌ {name}: {e}")
+        finally:
+            with self._lock:
+                self._active.pop(video_path, None)
@@ -0,0 +1,224 @@
+"""
+Distributed stage workers for the Video Translator application
+"""
+
+import json
+import os
+import socket
+import threading
+import uuid
+
+from cancellation import CancellationToken, CancelledError
+from media_info import MediaInfo
+from pipeline import VideoPipeline
+from scheduler import ResourceScheduler
+from task_queue import TaskQueue
+from translator import TranslatorEngine
+from utils import TimeUtils
+from workspace import Workspace
+
+class StageWorker:
+    """Claim stage tasks from a shared queue and run them.
+
+    A job moves through extract -> transcribe -> translate -> burn, each stage
+    is a separate task that any worker advertising the stage can pick up.
+    Intermediates live in the job's directory next to the queue database, so
+    all workers need the queue directory and the source videos at the same paths."""
+
+    JOB_FILE = "job.json"
+    OUTPUT_SUBDIR = "translated"
+
+    def __init__(self, queue, stages=TaskQueue.STAGES, name=None, poll_interval=2.0,
+                 lease_seconds=TaskQueue.LEASE_SECONDS, scheduler=None, log_callback=None):
+        self.queue = queue
+        self.stages = list(stages)
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.scheduler = scheduler or ResourceScheduler()
+        self.log_callback = log_callback or print
+        self._stop_event = threading.Event()
+        self._cancel_token = None   # Token of the running task
+
+        unknown = set(self.stages) - set(TaskQueue.STAGES)
+        if unknown:
+            raise Exception(f"Unknown stage(s): {', '.join(sorted(unknown))}")
+
+    @staticmethod
+    def submit_video(queue, video_path, settings=None):
+        """Queue a video for processing, returns the job id"""
+        video_path = os.path.abspath(video_path)
+        settings = VideoPipeline.build_settings(settings)
+        if not settings["output_dir"]:
+            # Workers run in different directories, so make the default absolute
+            settings["output_dir"] = os.path.join(os.path.dirname(video_path),
+                                                  StageWorker.OUTPUT_SUBDIR)
+        job = uuid.uuid4().hex[:12]
+        job_dir = queue.job_dir(job)
+        os.makedirs(job_dir)
+        StageWorker._save_job(job_dir, {"video_path": video_path, "settings": settings,
+                                        "state": {}})
+        queue.submit(job, "extract")
+        return job
+
+    @staticmethod
+    def _load_job(job_dir):
+        with open(os.path.join(job_dir, StageWorker.JOB_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _save_job(job_dir, job):
+        path = os.path.join(job_dir, StageWorker.JOB_FILE)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(job, f, ensure_ascii=False)
+        os.replace(f"{path}.tmp", path)
+
+    def log(self, msg):
+        """Log a message with a timestamp"""
+        self.log_callback(f"[{TimeUtils.get_timestamp()}] {self.name}: {msg}")
+
+    def run(self):
+        """Process tasks until stop() is called"""
+        self.log(f"Worker for {', '.join(self.stages)} on {self.queue.queue_dir}")
+        self.log(f"CPU budget: {self.scheduler.describe()}")
+        try:
+            while not self._stop_event.is_set():
+                self.queue.register(self.name, self.stages)
+                if not self.run_once():
+                    self._stop_event.wait(self.poll_interval)
+        finally:
+            self.queue.unregister(self.name)
+
+    def stop(self, cancel=False):
+        """Stop after the running task, or cancel it and hand it back to the queue"""
+        self._stop_event.set()
+        if cancel and self._cancel_token:
+            self._cancel_token.cancel("Worker stopped")
+
+    def run_once(self):
+        """Claim and run one task, returns False when there was nothing to do"""
+        for job in self.queue.expire():
+            self.log(f"❌ Job {job} given up after its worker vanished")
+            self._discard(job)
+        task = self.queue.claim(self.name, self.stages, self.lease_seconds)
+        if task is None:
+            return False
+
+        self.log(f"{task['stage']} {task['job']} (attempt {task['attempt']})")
+        token = self._cancel_token = CancellationToken()
+        lease_lost = threading.Event()
+        done = threading.Event()
+        keeper = threading.Thread(target=self._keep_lease,
+                                  args=(task, done, lease_lost, token), daemon=True)
+        keeper.start()
+        try:
+            next_stage = self._run_stage(task, token)
+        except CancelledError as e:
+            if not lease_lost.is_set():
+                # Stopped or timed out: give the capacity back to the queue
+                self.log(f"⚠ {task['stage']} {task['job']} cancelled: {e}")
+                if self._stop_event.is_set():
+                    self.queue.release(task["id"], self.name)
+                elif self.queue.fail(task["id"], self.name, e):
+                    self._discard(task["job"])
+            else:
+                self.log(f"⚠ Lease on {task['stage']} {task['job']} was lost, stage stopped")
+            return True
+        except BaseException as e:
+            token.cancel("Worker interrupted")
+            if isinstance(e, Exception):
+                self.log(f"❌ {task['stage']} {task['job']}: {e}")
+                if self.queue.fail(task["id"], self.name, e):
+                    self._discard(task["job"])
+                return True
+            self.queue.release(task["id"], self.name)
+            raise
+        finally:
+            done.set()
+            keeper.join()
+            self._cancel_token = None
+
+        next_tasks = [(task["job"], next_stage, {})] if next_stage else []
+        if lease_lost.is_set() or not self.queue.complete(task["id"], self.name, next_tasks):
+            self.log(f"⚠ Lease on {task['stage']} {task['job']} was lost, result discarded")
+        elif next_stage is None:
+            self._discard(task["job"])
+            self.log(f"✓ Finished job {task['job']}")
+        return True
+
+    def _discard(self, job):
+        """Remove the intermediate files of a finished or failed job"""
+        Workspace.attach(self.queue.job_dir(job)).cleanup()
+
+    def _keep_lease(self, task, done, lease_lost, token):
+        """Renew the lease while the stage runs, stop the stage once it is lost"""
+        while not done.wait(self.lease_seconds / 3):
+            if not self.queue.renew(task["id"], self.name, self.lease_seconds):
+                lease_lost.set()
+                token.cancel("Lease lost")
+                return
+
+    def _run_stage(self, task, cancel_token):
+        """Run a stage of a job, returns the next stage or None when the job is done"""
+        job_dir = self.queue.job_dir(task["job"])
+        job = self._load_job(job_dir)
+        name = os.path.basename(job["video_path"])
+        pipeline = VideoPipeline(translator=TranslatorEngine(),
+                                 log_callback=lambda msg: self.log(f"{name}: {msg}"),
+                                 scheduler=self.scheduler, cancel_token=cancel_token)
+        stage = getattr(self, f"_{task['stage']}")
+        next_stage = stage(pipeline, job, Workspace.attach(job_dir))
+        self._save_job(job_dir, job)
+        return next_stage
+
+    def _extract(self, pipeline, job, workspace):
+        video_path, settings, state = job["video_path"], job["settings"], job["state"]
+        info, start, end, duration = pipeline.probe(video_path, settings)
+        state.update(start=start, end=end, duration=duration)
+        state["audio"] = pipeline.extract(video_path, workspace.file("audio.wav"), settings,
+                                          info, duration, start, end)
+        return "transcribe"
+
+    def _transcribe(self, pipeline, job, workspace):
+        video_path, settings, state = job["video_path"], job["settings"], job["state"]
+        # Settings resolved here are stored with the job for the later stages
+        pipeline.resolve_model(video_path, settings, MediaInfo.probe(video_path),
+                               state["duration"], state["start"])
+        text, segments, language = pipeline.transcribe(state["audio"], video_path, settings,
+                                                       state["duration"], state["start"])
+        transcript = {"text": text, "segments": segments, "language": language}
+        with open(workspace.file("transcript.json"), "w", encoding="utf-8") as f:
+            json.dump(transcript, f, ensure_ascii=False)
+        return "translate"
+
+    def _translate(self, pipeline, job, workspace):
+        video_path, settings = job["video_path"], job["settings"]
+        with open(workspace.file("transcript.json"), "r", encoding="utf-8") as f:
+            transcript = json.load(f)
+        text, segments = transcript["text"], transcript["segments"]
+        if not text:
+            self.log(f"⚠ No text found for translation in {os.path.basename(video_path)}")
+            return None
+
+        translated, translated_segments = pipeline.translate(text, segments,
+                                                             transcript["language"], settings)
+        paths = VideoPipeline.output_paths(video_path, settings)
+        if settings["output_dir"]:
+            os.makedirs(settings["output_dir"], exist_ok=True)
+        keys = pipeline.write_outputs(text, translated, segments, translated_segments,
+                                      settings, VideoPipeline.work_paths(workspace, paths))
+        VideoPipeline.publish(workspace, paths, keys)
+
+        if "video" in paths and MediaInfo.probe(video_path).video_streams:
+            return "burn"
+        return None
+
+    def _burn(self, pipeline, job, workspace):
+        video_path, settings, state = job["video_path"], job["settings"], job["state"]
+        paths = VideoPipeline.output_paths(video_path, settings)
+        work = VideoPipeline.work_paths(workspace, paths)
+        pipeline.burn(video_path, paths["srt"], work["video"], settings,
+                      MediaInfo.probe(video_path), state["duration"], state["start"],
+                      state["end"])
+        VideoPipeline.publish(workspace, paths, ["video"])
+        return None
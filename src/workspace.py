@@ -0,0 +1,117 @@
+"""
+Job workspaces for the Video Translator application
+"""
+
+import os
+import re
+import shutil
+import tempfile
+
+class Workspace:
+    """Isolated scratch directory for the intermediate files of one job"""
+
+    RAM_DIRS = ("/dev/shm",)
+    RAM_CAP_MB = 2048          # Larger jobs fall back to disk
+    RAM_FREE_SHARE = 0.5       # Never take more than this share of free RAM space
+    PREFIX = "video_translator_"
+
+    def __init__(self, job_name="job", size_hint_mb=0, ram_cap_mb=RAM_CAP_MB, disk_dir=None):
+        root = self._pick_root(size_hint_mb, ram_cap_mb)
+        self.in_memory = root is not None
+        safe_name = re.sub(r"[^A-Za-z0-9_-]+", "_", job_name)[:40]
+        # The pid in the name lets remove_stale() find workspaces of dead processes
+        self.path = tempfile.mkdtemp(prefix=f"{self.PREFIX}{os.getpid()}_{safe_name}_",
+                                     dir=root or disk_dir)
+
+    @staticmethod
+    def attach(path):
+        """Use an existing directory as workspace, e.g. a job directory shared
+        between stage workers"""
+        workspace = Workspace.__new__(Workspace)
+        workspace.in_memory = False
+        workspace.path = path
+        os.makedirs(path, exist_ok=True)
+        return workspace
+
+    @staticmethod
+    def _pick_root(size_hint_mb, ram_cap_mb):
+        """Use a RAM-backed directory when the job fits, None means disk"""
+        if size_hint_mb > ram_cap_mb:
+            return None
+        for directory in Workspace.RAM_DIRS:
+            if not (os.path.isdir(directory) and os.access(directory, os.W_OK)):
+                continue
+            free_mb = shutil.disk_usage(directory).free / (1024 * 1024)
+            if size_hint_mb <= free_mb * Workspace.RAM_FREE_SHARE:
+                return directory
+        return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cleanup()
+
+    def file(self, name):
+        """Path of a file inside the workspace"""
+        return os.path.join(self.path, name)
+
+    def publish(self, name, destination):
+        """Move a finished file to its destination atomically"""
+        source = self.file(name)
+        try:
+            os.replace(source, destination)
+        except OSError:
+            # Different filesystem: copy next to the destination, then rename
+            partial = f"{destination}.part"
+            try:
+                shutil.copyfile(source, partial)
+                os.replace(partial, destination)
+            except Exception:
+                Workspace._remove(partial)
+                raise
+            os.remove(source)
+        return destination
+
+    def cleanup(self):
+        """Delete the workspace and everything left in it"""
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def remove_stale(disk_dir=None):
+        """Delete workspaces left behind by processes that no longer run"""
+        removed = []
+        for root in Workspace.RAM_DIRS + (disk_dir or tempfile.gettempdir(),):
+            try:
+                entries = list(os.scandir(root))
+            except OSError:
+                continue
+            for entry in entries:
+                match = re.match(rf"{Workspace.PREFIX}(\d+)_", entry.name)
+                if not match or not entry.is_dir():
+                    continue
+                pid = int(match.group(1))
+                if pid == os.getpid() or Workspace._process_alive(pid):
+                    continue
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed.append(entry.path)
+        return removed
+
+    @staticmethod
+    def _process_alive(pid):
+        if os.name == "nt":
+            return True  # os.kill would terminate the process on Windows
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except (PermissionError, OSError):
+            return True
+        return True